@@ -0,0 +1,84 @@
+"""
+Генератор синтетических csv-файлов с вакансиями в формате, который ожидает DataSet
+(name, salary_from, salary_to, salary_currency, area_name, published_at)
+
+Запуск из корня репозитория:
+    python -m benchmarks.generate <количество строк> <имя файла> [--seed N] [--malformed доля]
+"""
+import argparse
+import csv
+import random
+
+COLUMNS = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+
+NAMES = ['Программист', 'Программист Python', 'Программист 1С', 'Java-разработчик', 'Frontend-разработчик',
+         'Аналитик', 'Системный аналитик', 'Тестировщик', 'Менеджер по продажам', 'Бухгалтер', 'Водитель',
+         'Дизайнер', 'Инженер', 'Оператор call-центра', 'Администратор', 'Курьер', 'Продавец-консультант']
+
+AREAS = {'Москва': 30, 'Санкт-Петербург': 12, 'Россия': 3, 'Новосибирск': 4, 'Екатеринбург': 4, 'Казань': 3,
+         'Нижний Новгород': 3, 'Ростов-на-Дону': 2, 'Краснодар': 2, 'Самара': 2, 'Воронеж': 2, 'Минск': 2,
+         'Алматы': 2, 'Киев': 2, 'Ташкент': 1, 'Баку': 1, 'Тбилиси': 1, 'Бишкек': 1}
+SMALL_AREAS = [f'Населённый пункт {i}' for i in range(2000)]
+SMALL_AREAS_WEIGHT = 23
+
+CURRENCIES = {'RUR': 90, 'USD': 3, 'EUR': 1.5, 'KZT': 2, 'UAH': 1.5, 'BYR': 1, 'AZN': 0.3, 'GEL': 0.2, 'KGS': 0.3,
+              'UZS': 0.2}
+SALARY_SCALE = {'RUR': 1, 'USD': 1 / 60, 'EUR': 1 / 60, 'KZT': 7, 'UAH': 0.6, 'BYR': 1 / 24, 'AZN': 1 / 35,
+                'GEL': 1 / 22, 'KGS': 1.3, 'UZS': 180}
+
+
+def generate_rows(count, seed=0, malformed=0.01):
+    """
+    Генерирует строки csv-файла (без заголовка)
+    Args:
+        count (int): количество строк
+        seed (int): зерно генератора случайных чисел
+        malformed (float): доля испорченных строк (пустые поля или неверное количество столбцов)
+
+    Returns:
+        генератор строк
+    """
+    rnd = random.Random(seed)
+    areas = list(AREAS) + ['']
+    area_weights = list(AREAS.values()) + [SMALL_AREAS_WEIGHT]
+    currencies = list(CURRENCIES)
+    currency_weights = list(CURRENCIES.values())
+    for _ in range(count):
+        area = rnd.choices(areas, area_weights)[0] or rnd.choice(SMALL_AREAS)
+        currency = rnd.choices(currencies, currency_weights)[0]
+        salary_from = round(rnd.lognormvariate(11, 0.5) * SALARY_SCALE[currency], -2 if currency == 'RUR' else 0)
+        salary_to = salary_from * rnd.uniform(1, 1.6)
+        row = [rnd.choice(NAMES), f'{salary_from:.1f}', f'{round(salary_to):.1f}', currency, area,
+               f'{rnd.randint(2003, 2022)}-{rnd.randint(1, 12):02}-{rnd.randint(1, 28):02}T'
+               f'{rnd.randint(0, 23):02}:{rnd.randint(0, 59):02}:{rnd.randint(0, 59):02}+0300']
+        if rnd.random() < malformed:
+            if rnd.random() < 0.5:
+                row[rnd.randrange(len(row))] = ''
+            else:
+                row = row[:rnd.randrange(1, len(row))]
+        yield row
+
+
+def generate_file(file_name, count, seed=0, malformed=0.01):
+    """
+    Записывает синтетический csv-файл с вакансиями
+    Args:
+        file_name (str): имя файла
+        count (int): количество строк (без заголовка)
+        seed (int): зерно генератора случайных чисел
+        malformed (float): доля испорченных строк
+    """
+    with open(file_name, 'w', encoding='utf_8_sig', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        writer.writerows(generate_rows(count, seed, malformed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Генератор синтетических вакансий')
+    parser.add_argument('rows', type=float, help='количество строк (можно 1e6)')
+    parser.add_argument('file_name', help='имя csv-файла')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора случайных чисел')
+    parser.add_argument('--malformed', type=float, default=0.01, help='доля испорченных строк')
+    args = parser.parse_args()
+    generate_file(args.file_name, int(args.rows), args.seed, args.malformed)
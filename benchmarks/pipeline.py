@@ -0,0 +1,102 @@
+"""
+Бенчмарк всего конвейера: для каждого размера генерирует синтетический csv-файл (benchmarks.generate)
+и отдельно замеряет этапы - чтение и проверку строк потоковым DataSet, создание записей VacancyRecord,
+ParseData.inspection_vacancy, рейтинг городов, generate_excel и generate_image. Результаты записываются в JSON, чтобы сравнивать запуски
+
+Запуск из корня репозитория:
+    python -m benchmarks.pipeline --sizes 1e4 1e5 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+import main
+from benchmarks.generate import generate_file
+
+
+def run_pipeline(file_name, prof, work_dir):
+    """
+    Прогоняет конвейер по файлу в потоковом режиме (строки не загружаются в память целиком, поэтому
+    замеряются и файлы на 1e7-1e8 строк), замеряя каждый этап через main.StageMetrics
+    Args:
+        file_name (str): имя csv-файла
+        prof (str): профессия
+        work_dir (str): папка для xlsx и png отчётов
+
+    Returns:
+        dict: название этапа -> время, количество строк, скорость и метрики памяти
+    """
+    metrics = main.StageMetrics()
+    dataset = main.DataSet(file_name, streaming=True, metrics=metrics)
+    vacancies = metrics.wrap('vacancy_construction',
+                             main.VacancyRecord.from_rows(dataset.columns_names, dataset.vacancies_data),
+                             upstream='row_filtering')
+    data = main.ParseData()
+    with metrics.stage('inspection_vacancy', upstream='vacancy_construction') as stage:
+        data.inspection_vacancy(prof, vacancies)
+        stage['rows'] = data.count_vac_by_year.length
+    data.checked_salary()
+    salary_by_city = data.salary_lvl_by_city
+    with metrics.stage('city_ranking', len(salary_by_city.salary_dict)):
+        main.ParseData.get_top_aver_salary(salary_by_city)
+        main.ParseData.get_top_rate_by_city(data.vacancy_rate_by_city)
+    result = data.get_results()
+
+    report = main.Report()
+    with metrics.stage('generate_excel', len(result[0])):
+        report.generate_excel(result, prof, os.path.join(work_dir, 'report.xlsx'))
+    with metrics.stage('generate_image', len(result[0])):
+        report.generate_image(result, prof, os.path.join(work_dir, 'graph.png'))
+    report.close()
+    return metrics.summary()
+
+
+def main_benchmark(sizes, output, prof='Программист', seed=0, malformed=0.01, keep_files=None):
+    """
+    Запускает бенчмарк для каждого размера и сохраняет результаты в JSON
+    Args:
+        sizes (list): размеры синтетических файлов (количество строк)
+        output (str): имя JSON-файла с результатами (None - вывод в stdout)
+        prof (str): профессия
+        seed (int): зерно генератора
+        malformed (float): доля испорченных строк
+        keep_files (str): папка, в которой сохраняются сгенерированные файлы (по умолчанию - временная)
+    """
+    results = {'started_at': datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(), 'platform': platform.platform(),
+               'profession': prof, 'seed': seed, 'malformed': malformed, 'runs': []}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = keep_files or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for size in sizes:
+            file_name = os.path.join(work_dir, f'vacancies_{size}_{seed}.csv')
+            if not os.path.exists(file_name):
+                generate_file(file_name, size, seed, malformed)
+            stages = run_pipeline(file_name, prof, temp_dir)
+            results['runs'].append({'size': size, 'file_size': os.path.getsize(file_name), 'stages': stages})
+            print(f'{size}: ' + ', '.join(f'{name} {stage["seconds"]:.3f} с' for name, stage in stages.items()),
+                  file=sys.stderr)
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf_8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарк конвейера обработки вакансий')
+    parser.add_argument('--sizes', nargs='+', type=float, default=[1e4, 1e5],
+                        help='размеры синтетических файлов (от 1e4 до 1e8 строк)')
+    parser.add_argument('--output', help='JSON-файл с результатами (по умолчанию - stdout)')
+    parser.add_argument('--profession', default='Программист', help='профессия')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    parser.add_argument('--malformed', type=float, default=0.01, help='доля испорченных строк')
+    parser.add_argument('--keep-files', metavar='DIR', help='сохранять сгенерированные файлы в папке DIR')
+    args = parser.parse_args()
+    main_benchmark([int(size) for size in args.sizes], args.output, args.profession, args.seed, args.malformed,
+                   args.keep_files)
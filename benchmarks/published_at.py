@@ -0,0 +1,57 @@
+"""
+Микробенчмарк разбора даты публикации: сравнивает прежний путь через datetime.strptime
+с быстрым путём Vacancy.parse_year (обычный и строгий режимы)
+
+Запуск из корня репозитория:
+    python -m benchmarks.published_at [количество дат]
+"""
+import random
+import sys
+import timeit
+from datetime import datetime
+
+from main import Vacancy
+
+
+def strptime_year(value):
+    """Прежний способ получения года - полный разбор даты через strptime"""
+    return int(datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z').strftime('%Y'))
+
+
+def generate_dates(count, seed=0):
+    """
+    Генерирует даты публикации в формате ISO-8601
+    Args:
+        count (int): количество дат
+        seed (int): зерно генератора случайных чисел
+
+    Returns:
+        list: список строк с датами
+    """
+    rnd = random.Random(seed)
+    return [f'{rnd.randint(2003, 2022)}-{rnd.randint(1, 12):02}-{rnd.randint(1, 28):02}T'
+            f'{rnd.randint(0, 23):02}:{rnd.randint(0, 59):02}:{rnd.randint(0, 59):02}+0300' for _ in range(count)]
+
+
+def main(count=100_000, repeat=3):
+    """
+    Замеряет время разбора count дат каждым способом и выводит результаты
+    Args:
+        count (int): количество дат
+        repeat (int): количество повторов замера (берётся лучший результат)
+    """
+    dates = generate_dates(count)
+    variants = {'strptime': strptime_year,
+                'parse_year': Vacancy.parse_year,
+                'parse_year (strict)': lambda value: Vacancy.parse_year(value, True)}
+    expected = [strptime_year(value) for value in dates]
+    baseline = None
+    for name, function in variants.items():
+        assert [function(value) for value in dates] == expected, name
+        best = min(timeit.repeat(lambda: [function(value) for value in dates], number=1, repeat=repeat))
+        baseline = baseline or best
+        print(f'{name:<20} {best:8.3f} с  {count / best:12,.0f} строк/с  x{baseline / best:.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
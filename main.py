@@ -1,13 +1,32 @@
+import copy
+import argparse
+import bisect
+import bz2
+import cProfile
 import csv
 import datetime
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import lzma
+import math
+import os
+import pickle
+import re
 import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from statistics import mean
-from openpyxl import Workbook
-from openpyxl.styles import Font, Border, Side
-from openpyxl.styles.numbers import FORMAT_PERCENTAGE_00
-import numpy as np
-import matplotlib.pyplot as plt
+from itertools import chain, islice
+from operator import itemgetter
 
 
 class UsersInput:
@@ -27,67 +46,478 @@ class UsersInput:
         self.file_name = self.check_file_name(self.file_name)
         self.profession_name = self.check_profession_name(self.profession_name)
 
-    if __name__ == '__main__':
-        @staticmethod
-        def check_file_name(file_name):
-            """
-            Проверяет имя файла на корректность
-            Корректное название файла не должно быть пустым и должно соджержать расширение файла
-            Args:
-                file_name (str): имя файла
-
-            Returns:
-                file_name: string
-
-            """
-            if file_name == '' or '.' not in file_name:
-                print('Некорректное название файла, попробуйте ещё раз!')
-                sys.exit()
-            return file_name
-
-        @staticmethod
-        def check_profession_name(profession_name):
-            """
-            Проверка введённой пользователем профессии на корректность.
-            Корректное название профессии не должно быть пустым
-            Args:
-                profession_name (str): введённое пользователем название профессии
-
-            Returns:
-                profession_name: string
-            """
-            if profession_name == '':
-                print('Некорректное название профессии')
-                sys.exit()
-            return profession_name
+    @staticmethod
+    def check_file_name(file_name):
+        """
+        Проверяет имя файла на корректность
+        Корректное название файла не должно быть пустым и должно соджержать расширение файла
+        Args:
+            file_name (str): имя файла
+
+        Returns:
+            file_name: string
+
+        """
+        if file_name == '' or '.' not in file_name:
+            print('Некорректное название файла, попробуйте ещё раз!')
+            sys.exit(1)
+        return file_name
+
+    @staticmethod
+    def check_profession_name(profession_name):
+        """
+        Проверка введённой пользователем профессии на корректность.
+        Корректное название профессии не должно быть пустым
+        Args:
+            profession_name (str): введённое пользователем название профессии
+
+        Returns:
+            profession_name: string
+        """
+        if profession_name == '':
+            print('Некорректное название профессии')
+            sys.exit(1)
+        return profession_name
 
 
 class DataSet:
     """
-    Класс, отвечающий за данные о вакансиях. Данные получены из csv-файла
+    Класс, отвечающий за данные о вакансиях. Данные получены из csv-файла, сжатого csv-файла (.gz, .bz2, .xz)
+    или набора таких файлов-частей (папка или шаблон имени), у которых должен совпадать заголовок
     Attributes:
         reader: информация, считанная из csv-файла в виде массива строк таблицы
         (внешний массив - строки, внутренние массивы - информация из стобцов в данной строке)
         columns_names: названия столбцов в csv-файле
         vacancies_data: массив обработанных данных по вакансиям из csv-файла
-        (в него попадают только строки, в которых заполнены все столбцы)
+        (в него попадают только строки, прошедшие проверку RowValidator),
+        в потоковом режиме - генератор этих строк
+        validator: объект RowValidator со счётчиками отклонённых строк
     """
-    def __init__(self, file_name):
+    openers = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+    buffer_size = 1024 * 1024
+
+    def __init__(self, file_name, streaming=False, metrics=None, quarantine=None):
         """
         Инициализирует объект DataSet, обрабатывает данные из csv-файла
         Args:
             file_name (str): имя csv-файла,на основе которого собираются данные по вакансиям
+            (или папки колоночного хранилища ColumnStore - тогда vacancies_data и есть это хранилище;
+            папки или шаблона имени с файлами-частями - тогда части читаются друг за другом, см. read_sources)
+            streaming (bool): если True, строки не загружаются в память целиком, а vacancies_data
+            становится генератором, лениво отдающим проверенные строки
+            metrics (StageMetrics): объект для сбора метрик этапов csv_read и row_filtering (в потоковом режиме)
+            quarantine (str): имя csv-файла, в который записываются отклонённые строки с причиной отклонения
         """
-        self.reader = [row for row in csv.reader(open(file_name, encoding='utf_8_sig'))]
+        if ColumnStore.is_store(file_name):
+            self.reader = None
+            self.validator = None
+            self.vacancies_data = ColumnStore(file_name)
+            self.columns_names = self.vacancies_data.columns_names
+            if self.vacancies_data.rows_count == 0:
+                print('Нет данных')
+                sys.exit(1)
+            return
+
+        if streaming:
+            self.reader = self.read_sources(file_name)
+            if metrics is not None:
+                self.reader = metrics.wrap('csv_read', self.reader)
+            self.columns_names = next(self.reader, None)
+            if self.columns_names is None:
+                print('Пустой файл')
+                sys.exit(1)
+            self.validator = RowValidator(self.columns_names, quarantine=quarantine)
+            rows = self.validator.validate(self.reader)
+            if metrics is not None:
+                rows = metrics.wrap('row_filtering', rows, upstream='csv_read')
+            first_row = next(rows, None)
+            if first_row is None:
+                print('Нет данных')
+                sys.exit(1)
+            self.vacancies_data = chain([first_row], rows)
+            return
+
+        self.reader = list(self.read_sources(file_name))
         if len(self.reader) == 0:
             print('Пустой файл')
-            sys.exit()
+            sys.exit(1)
         self.columns_names = self.reader[0]
-        self.vacancies_data = [row for row in self.reader[1:] if
-                               len(row) == len(self.columns_names) and row.count('') == 0]
+        self.validator = RowValidator(self.columns_names, quarantine=quarantine)
+        self.vacancies_data = list(self.validator.validate(self.reader[1:]))
         if len(self.vacancies_data) == 0:
             print('Нет данных')
-            sys.exit()
+            sys.exit(1)
+
+    @classmethod
+    def open_text(cls, file_name):
+        """
+        Открывает csv-файл на чтение крупными блоками; сжатые файлы (.gz, .bz2, .xz) распаковываются
+        на лету, без записи распакованных данных на диск
+        Args:
+            file_name (str): имя файла
+
+        Returns:
+            текстовый файловый объект
+        """
+        opener = cls.openers.get(os.path.splitext(file_name)[1].lower())
+        if opener is None:
+            return open(file_name, encoding='utf_8_sig', buffering=cls.buffer_size)
+        return io.TextIOWrapper(io.BufferedReader(opener(file_name, 'rb'), cls.buffer_size), encoding='utf_8_sig')
+
+    @classmethod
+    def is_compressed(cls, file_name):
+        """Проверяет, сжат ли файл (по расширению)"""
+        return os.path.splitext(file_name)[1].lower() in cls.openers
+
+    @staticmethod
+    def is_pattern(path):
+        """Проверяет, является ли path шаблоном имени (содержит символы *, ? или [)"""
+        return any(char in path for char in '*?[')
+
+    @classmethod
+    def expand_sources(cls, path):
+        """
+        Возвращает список файлов-частей: для папки - лежащие в ней csv-файлы (в том числе сжатые),
+        для шаблона имени - подходящие под него файлы; части упорядочены по имени
+        Args:
+            path (str): имя файла, папки или шаблон имени
+
+        Returns:
+            list: имена файлов
+        """
+        if os.path.isdir(path):
+            extensions = tuple('.csv' + extension for extension in ['', *cls.openers])
+            shards = [os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(extensions)]
+        elif DataSet.is_pattern(path):
+            shards = glob.glob(path)
+        else:
+            return [path]
+        shards = sorted(shard for shard in shards if os.path.isfile(shard))
+        if not shards:
+            print(f'Не найдено ни одного csv-файла: {path}')
+            sys.exit(1)
+        return shards
+
+    @staticmethod
+    def check_header(columns_names, header, shard):
+        """
+        Завершает работу, если заголовок файла-части отличается от заголовка первой части
+        Args:
+            columns_names (list): заголовок первой непустой части
+            header (list): заголовок проверяемой части
+            shard (str): имя проверяемой части
+        """
+        if header != columns_names:
+            print(f'Заголовок файла {shard} не совпадает с заголовком остальных файлов')
+            sys.exit(1)
+
+    @staticmethod
+    def read_csv(file_name):
+        """
+        Построчно читает csv-файл (в том числе сжатый), не загружая его в память целиком
+        Args:
+            file_name (str): имя csv-файла
+
+        Returns:
+            генератор строк csv-файла
+        """
+        with DataSet.open_text(file_name) as file:
+            yield from csv.reader(file)
+
+    @staticmethod
+    def read_sources(file_name):
+        """
+        Построчно читает все файлы-части по очереди: заголовок отдаётся один раз,
+        у остальных частей он проверяется на совпадение с первым (пустые части пропускаются)
+        Args:
+            file_name (str): имя файла, папки или шаблон имени
+
+        Returns:
+            генератор строк: заголовок, затем строки данных всех частей
+        """
+        columns_names = None
+        for shard in DataSet.expand_sources(file_name):
+            rows = DataSet.read_csv(shard)
+            header = next(rows, None)
+            if header is None:
+                continue
+            if columns_names is None:
+                columns_names = header
+                yield header
+            DataSet.check_header(columns_names, header, shard)
+            yield from rows
+
+    @staticmethod
+    def filter_rows(rows, columns_names):
+        """
+        Отбирает строки, прошедшие проверку RowValidator (без сохранения счётчиков отклонённых строк)
+        Args:
+            rows: итерируемый объект со строками csv-файла
+            columns_names (list): названия столбцов в csv-файле
+
+        Returns:
+            генератор подходящих строк
+        """
+        return RowValidator(columns_names).validate(rows)
+
+    @staticmethod
+    def read_header(file_name):
+        """
+        Читает строку заголовка csv-файла
+        Args:
+            file_name (str): имя csv-файла
+
+        Returns:
+            columns_names: названия столбцов (None для пустого файла)
+            data_start: номер байта, с которого начинаются данные
+        """
+        with open(file_name, 'rb') as file:
+            header = file.readline()
+            if not header:
+                return None, 0
+            return next(csv.reader([header.decode('utf_8_sig')])), file.tell()
+
+    @staticmethod
+    def complete_lines_end(file_name, block_size=64 * 1024):
+        """
+        Возвращает номер байта, следующего за последним символом перевода строки в файле
+        (недописанная последняя строка не учитывается)
+        Args:
+            file_name (str): имя файла
+            block_size (int): размер блока, которыми файл читается с конца
+
+        Returns:
+            int: конец последней полной строки
+        """
+        with open(file_name, 'rb') as file:
+            position = file.seek(0, os.SEEK_END)
+            while position > 0:
+                start = max(position - block_size, 0)
+                file.seek(start)
+                block = file.read(position - start)
+                index = block.rfind(b'\n')
+                if index != -1:
+                    return start + index + 1
+                position = start
+        return 0
+
+    @staticmethod
+    def split_into_chunks(file_name, chunks_count):
+        """
+        Делит csv-файл на диапазоны байтов, границы которых совпадают с началами записей: файл просматривается
+        один раз с подсчётом кавычек, и граница ставится только после перевода строки, перед которым
+        чётное число кавычек (то есть не внутри поля в кавычках, содержащего перевод строки)
+        Args:
+            file_name (str): имя csv-файла
+            chunks_count (int): желаемое количество диапазонов
+
+        Returns:
+            columns_names: названия столбцов (None для пустого файла)
+            chunks: список пар (начало, конец) диапазонов байтов после строки заголовка
+        """
+        columns_names, data_start = DataSet.read_header(file_name)
+        if columns_names is None:
+            return None, []
+        with open(file_name, 'rb') as file:
+            size = file.seek(0, os.SEEK_END)
+            step = max((size - data_start) // max(chunks_count, 1), 1)
+            bounds = [data_start]
+            file.seek(data_start)
+            position = data_start
+            quotes = 0
+            for target in range(data_start + step, size, step):
+                if target <= position:
+                    continue
+                while position < target - 1:
+                    block = file.read(min(target - 1 - position, DataSet.buffer_size))
+                    quotes += block.count(b'"')
+                    position += len(block)
+                while True:
+                    line = file.readline()
+                    quotes += line.count(b'"')
+                    position += len(line)
+                    if not line or quotes % 2 == 0:
+                        break
+                if position >= size:
+                    break
+                bounds.append(position)
+            bounds.append(size)
+        return columns_names, [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+    @staticmethod
+    def read_chunk(file_name, start, end, columns_names, validator=None):
+        """
+        Построчно читает диапазон байтов csv-файла и отбирает строки, прошедшие проверку RowValidator
+        Args:
+            file_name (str): имя csv-файла
+            start (int): начало диапазона (начало строки)
+            end (int): конец диапазона (начало строки или конец файла)
+            columns_names (list): названия столбцов в csv-файле
+            validator (RowValidator): проверка строк, в которой копятся счётчики отклонённых строк
+            (по умолчанию - новая, без карантина)
+
+        Returns:
+            генератор подходящих строк
+        """
+        def lines():
+            position = start
+            with open(file_name, 'rb') as file:
+                file.seek(start)
+                for line in file:
+                    if position >= end:
+                        break
+                    position += len(line)
+                    yield line.decode('utf_8')
+
+        if validator is None:
+            return DataSet.filter_rows(csv.reader(lines()), columns_names)
+        return validator.validate(csv.reader(lines()))
+
+
+class RowValidator:
+    """
+    Проверка строк csv-файла, выполняемая в том же проходе, что и чтение: строка отклоняется, если в ней
+    другое количество столбцов (column_count), есть пустые значения (empty_field), зарплата не является
+    конечным числом (salary), валюта неизвестна (currency) или дата публикации не соответствует формату
+    %Y-%m-%dT%H:%M:%S%z (date; проверка всегда строгая, независимо от Vacancy.strict_dates).
+    Отклонённые строки не останавливают обработку: они считаются по причинам и, если задан файл карантина,
+    записываются в него вместе с причиной
+    Attributes:
+        columns_names: названия столбцов в csv-файле
+        salary_indexes: номера столбцов с зарплатой
+        currency_index: номер столбца с валютой (None, если его нет)
+        date_index: номер столбца с датой публикации (None, если его нет)
+        currencies: известные валюты
+        quarantine: имя csv-файла для отклонённых строк (None - строки не сохраняются)
+        accepted: количество принятых строк
+        counters: причина отклонения -> количество строк
+    """
+    def __init__(self, columns_names, currencies=None, quarantine=None):
+        """
+        Инициализирует объект RowValidator
+        Args:
+            columns_names (list): названия столбцов в csv-файле
+            currencies: известные валюты (по умолчанию - валюты из ParseData.currency_rates)
+            quarantine (str): имя csv-файла для отклонённых строк
+        """
+        if currencies is None:
+            rates = ParseData.currency_rates
+            currencies = set(rates.fixed) | set(rates.points)
+        self.columns_names = columns_names
+        self.salary_indexes = [columns_names.index(name) for name in ('salary_from', 'salary_to')
+                               if name in columns_names]
+        self.currency_index = columns_names.index('salary_currency') if 'salary_currency' in columns_names else None
+        self.date_index = columns_names.index('published_at') if 'published_at' in columns_names else None
+        self.currencies = frozenset(currencies)
+        self.quarantine = quarantine
+        self.accepted = 0
+        self.counters = {}
+
+    def get_reason(self, row):
+        """
+        Возвращает причину отклонения строки (None, если строка корректна)
+        Args:
+            row (list): строка csv-файла
+
+        Returns:
+            str: причина отклонения или None
+        """
+        if len(row) != len(self.columns_names):
+            return 'column_count'
+        if '' in row:
+            return 'empty_field'
+        try:
+            for index in self.salary_indexes:
+                if not -math.inf < float(row[index]) < math.inf:
+                    return 'salary'
+        except ValueError:
+            return 'salary'
+        if self.currency_index is not None and row[self.currency_index] not in self.currencies:
+            return 'currency'
+        if self.date_index is not None:
+            try:
+                Vacancy.parse_year(row[self.date_index], strict=True)
+            except ValueError:
+                return 'date'
+        return None
+
+    def validate(self, rows):
+        """
+        Отбирает корректные строки, считая и (при заданном файле карантина) сохраняя отклонённые.
+        Для строк вакансий проверки зарплаты и валюты выполняются прямо в цикле, а get_reason
+        вызывается только для строк, не прошедших одну из них, или для ещё не встречавшейся даты
+        Args:
+            rows: итерируемый объект со строками csv-файла
+
+        Returns:
+            генератор корректных строк
+        """
+        names = self.columns_names
+        length = len(names)
+        fast = len(self.salary_indexes) == 2 and None not in (self.currency_index, self.date_index)
+        if fast:
+            salary_from_index, salary_to_index = self.salary_indexes
+            currency_index, date_index = self.currency_index, self.date_index
+        currencies = self.currencies
+        year_cache = Vacancy._strict_year_cache
+        time_match = Vacancy.time_pattern.fullmatch
+        inf = math.inf
+        get_reason = self.get_reason
+        counters = self.counters
+        file = writer = None
+        try:
+            for row in rows:
+                reason = None
+                try:
+                    if not (fast and len(row) == length and '' not in row
+                            and -inf < float(row[salary_from_index]) < inf and -inf < float(row[salary_to_index]) < inf
+                            and row[currency_index] in currencies and row[date_index][:10] in year_cache
+                            and time_match(row[date_index], 10) is not None):
+                        reason = get_reason(row)
+                except ValueError:
+                    reason = get_reason(row)
+                if reason is None:
+                    self.accepted += 1
+                    yield row
+                    continue
+                counters[reason] = counters.get(reason, 0) + 1
+                if self.quarantine is not None:
+                    if writer is None:
+                        file = open(self.quarantine, 'w', encoding='utf_8_sig', newline='')
+                        writer = csv.writer(file)
+                        writer.writerow(names + ['reason'])
+                    writer.writerow(row + [reason])
+        finally:
+            if file is not None:
+                file.close()
+
+    def merge(self, other):
+        """
+        Добавляет счётчики другой проверки (например, выполненной над частью файла в отдельном процессе)
+        и переносит её отклонённые строки в конец своего файла карантина, удаляя файл другой проверки
+        Args:
+            other (RowValidator): проверка другой части строк
+        """
+        started = bool(self.counters)
+        self.accepted += other.accepted
+        for reason, count in other.counters.items():
+            self.counters[reason] = self.counters.get(reason, 0) + count
+        if self.quarantine is None or other.quarantine is None or not os.path.exists(other.quarantine):
+            return
+        mode, encoding = ('a', 'utf_8') if started else ('w', 'utf_8_sig')
+        with open(other.quarantine, encoding='utf_8_sig', newline='') as source, \
+                open(self.quarantine, mode, encoding=encoding, newline='') as file:
+            if started:
+                source.readline()
+            file.writelines(source)
+        os.remove(other.quarantine)
+
+    def get_report(self):
+        """Возвращает строку с количеством отклонённых строк по причинам (пустую, если отклонённых нет)"""
+        if not self.counters:
+            return ''
+        reasons = ', '.join(f'{reason}: {count}' for reason, count in sorted(self.counters.items()))
+        return f'Отклонено строк: {sum(self.counters.values())} ({reasons})'
 
 
 class Vacancy:
@@ -100,6 +530,7 @@ class Vacancy:
         salary_currency: валюта заработной платы
         area_name: название области деятельности
         published_at: дата публикации вакансии
+        month: месяц публикации вакансии в виде 'ГГГГ-ММ' (по нему выбирается курс валюты)
         salary: стандартное значение заработной платы
     """
     name: str
@@ -108,8 +539,14 @@ class Vacancy:
     salary_currency: str
     area_name: str
     published_at: str
+    month: str
     salary: str
 
+    strict_dates = False
+    time_pattern = re.compile(r'T([01]\d|2[0-3]):[0-5]\d:([0-5]\d|6[01])(Z|[+-]\d{2}:?\d{2})')
+    _year_cache = {}
+    _strict_year_cache = {}
+
     def __init__(self, vacancy):
         """
         Инициализирует объект Vacancy
@@ -118,6 +555,7 @@ class Vacancy:
         """
         for key, value in vacancy.items():
             self.__setattr__(key, self.formatter(key, value))
+        self.month = vacancy.get('published_at', '')[:7]
 
     @staticmethod
     def formatter(key, value):
@@ -130,9 +568,84 @@ class Vacancy:
         if key in ['salary_from', 'salary_to']:
             return float(value)
         if key == 'published_at':
-            return int(datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z').strftime('%Y'))
+            return Vacancy.parse_year(value, Vacancy.strict_dates)
         return value
 
+    @staticmethod
+    def parse_year(value, strict=False):
+        """
+        Возвращает год публикации из даты в формате ISO-8601 (%Y-%m-%dT%H:%M:%S%z) без вызова strptime для
+        каждой строки: год берётся из первых символов, а результат запоминается по префиксу даты
+        Args:
+            value (str): дата публикации
+            strict (bool): если True, дата и время полностью проверяются и некорректное значение вызывает ValueError,
+            как при разборе через strptime
+
+        Returns:
+            int: год публикации
+        """
+        prefix = value[:10]
+        if strict:
+            year = Vacancy._strict_year_cache.get(prefix)
+            if year is None:
+                year = datetime.strptime(prefix, '%Y-%m-%d').year
+                Vacancy._strict_year_cache[prefix] = year
+            if Vacancy.time_pattern.fullmatch(value, 10) is None:
+                raise ValueError(f"time data {value!r} does not match format '%Y-%m-%dT%H:%M:%S%z'")
+            return year
+        year = Vacancy._year_cache.get(prefix)
+        if year is None:
+            if len(prefix) < 10 or prefix[4] != '-' or not prefix[:4].isdecimal():
+                return int(datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z').strftime('%Y'))
+            year = Vacancy._year_cache[prefix] = int(prefix[:4])
+        return year
+
+
+class VacancyRecord:
+    """
+    Компактное представление вакансии: хранит в __slots__ только поля, нужные для статистики,
+    и создаётся напрямую из строки csv-файла по номерам столбцов
+    Attributes:
+        name: наименование вакансии
+        salary_from: нижняя граница заработной платы
+        salary_to: верхняя граница заработной платы
+        salary_currency: валюта заработной платы
+        area_name: название области деятельности
+        published_at: год публикации вакансии
+        month: месяц публикации вакансии в виде 'ГГГГ-ММ' (по нему выбирается курс валюты)
+    """
+    fields = ('name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at')
+    __slots__ = fields + ('month',)
+
+    def __init__(self, name, salary_from, salary_to, salary_currency, area_name, published_at, month=None):
+        """Инициализирует объект VacancyRecord уже приведёнными к нужному типу значениями"""
+        self.name = name
+        self.salary_from = salary_from
+        self.salary_to = salary_to
+        self.salary_currency = salary_currency
+        self.area_name = area_name
+        self.published_at = published_at
+        self.month = month
+
+    @classmethod
+    def from_rows(cls, columns_names, rows):
+        """
+        Создаёт объекты VacancyRecord из строк csv-файла
+        Args:
+            columns_names (list): названия столбцов в csv-файле
+            rows: итерируемый объект со строками csv-файла
+
+        Returns:
+            генератор объектов VacancyRecord
+        """
+        getter = itemgetter(*(columns_names.index(field) for field in cls.fields))
+        parse_year = Vacancy.parse_year
+        strict = Vacancy.strict_dates
+        for row in rows:
+            name, salary_from, salary_to, salary_currency, area_name, published_at = getter(row)
+            yield cls(name, float(salary_from), float(salary_to), salary_currency, area_name,
+                      parse_year(published_at, strict), published_at[:7])
+
 
 class Salary:
     """
@@ -155,11 +668,262 @@ class Salary:
         self.salary_currency = salary_currency
 
 
+class SalarySketch:
+    """
+    Логарифмическая гистограмма зарплат с фиксированными границами корзин: корзина k содержит зарплаты
+    из [gamma ** k, gamma ** (k + 1)), поэтому любой процентиль восстанавливается с относительной ошибкой
+    не больше (gamma - 1) / (gamma + 1), а количество корзин ограничено диапазоном зарплат (около тысячи
+    корзин на диапазон от 1 до миллиарда), а не количеством вакансий. Гистограммы объединяются сложением
+    Attributes:
+        buckets: номер корзины -> количество зарплат
+        zero_count: количество нулевых и отрицательных зарплат
+    """
+    __slots__ = ('buckets', 'zero_count')
+    gamma = 1.02
+    log_gamma = math.log(gamma)
+
+    def __init__(self):
+        """Инициализирует пустой объект SalarySketch"""
+        self.buckets = {}
+        self.zero_count = 0
+
+    def add(self, salary):
+        """
+        Учитывает очередную зарплату
+        Args:
+            salary: значение зарплаты
+        """
+        if salary > 0:
+            index = math.floor(math.log(salary) / self.log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        else:
+            self.zero_count += 1
+
+    def merge(self, other):
+        """
+        Добавляет к гистограмме другую гистограмму
+        Args:
+            other (SalarySketch): гистограмма, которую нужно добавить
+        """
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+
+    def quantile(self, q):
+        """
+        Возвращает приближённое значение процентиля
+        Args:
+            q (float): уровень процентиля от 0 до 1
+
+        Returns:
+            float: значение процентиля (None для пустой гистограммы)
+        """
+        count = self.zero_count + sum(self.buckets.values())
+        if count == 0:
+            return None
+        rank = q * (count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** (index + 1) / (self.gamma + 1)
+        return 2 * self.gamma ** (max(self.buckets) + 1) / (self.gamma + 1)
+
+    def histogram(self, width=10):
+        """
+        Возвращает укрупнённую гистограмму положительных зарплат
+        Args:
+            width (int): сколько соседних корзин объединяется в одну
+
+        Returns:
+            list: кортежи (нижняя граница, верхняя граница, количество) по возрастанию зарплат
+        """
+        merged = {}
+        for index, count in self.buckets.items():
+            merged[index // width] = merged.get(index // width, 0) + count
+        return [(self.gamma ** (index * width), self.gamma ** ((index + 1) * width), merged[index])
+                for index in sorted(merged)]
+
+
+class SalaryStat:
+    """
+    Накопительная статистика зарплат для одного ключа: хранит не сами зарплаты, а их количество и сумму,
+    поэтому занимает постоянный объём памяти. Сумма хранится точно - целым числителем дроби со знаменателем
+    2**scale (любое число float представимо так без округления), поэтому среднее округляется один раз,
+    при вычислении, и совпадает с statistics.mean независимо от порядка сложения и объединения частей
+    Attributes:
+        count: количество учтённых зарплат
+        numerator: числитель точной суммы учтённых зарплат
+        scale: степень двойки в знаменателе точной суммы
+        running_mean: среднее в арифметике float, по которому пересчитывается m2
+        min: минимальная зарплата
+        max: максимальная зарплата
+        m2: сумма квадратов отклонений от среднего (для расчёта дисперсии)
+        sketch: гистограмма зарплат SalarySketch для процентилей (None, если sketches выключен)
+        sketches: собирать ли гистограммы для новых объектов
+    """
+    __slots__ = ('count', 'numerator', 'scale', 'running_mean', 'min', 'max', 'm2', 'sketch')
+    sketches = False
+
+    def __init__(self):
+        """Инициализирует пустой объект класса SalaryStat"""
+        self.count = 0
+        self.numerator = 0
+        self.scale = 0
+        self.running_mean = 0.0
+        self.min = None
+        self.max = None
+        self.m2 = 0.0
+        self.sketch = SalarySketch() if SalaryStat.sketches else None
+
+    def __setstate__(self, state):
+        """
+        Восстанавливает объект из pickle (в сохранённых ранее объектах может не быть гистограммы,
+        а сумма может храниться приближённо - в total и compensation)
+        """
+        self.numerator, self.scale, self.running_mean, self.sketch = 0, 0, 0.0, None
+        state = dict(state[1])
+        for name in ('total', 'compensation'):
+            if name in state:
+                self.add_total(*self.split(state.pop(name)))
+        for key, value in state.items():
+            setattr(self, key, value)
+        if self.count and not self.running_mean:
+            self.running_mean = self.mean
+
+    @staticmethod
+    def split(value):
+        """
+        Представляет число в виде точной дроби со знаменателем - степенью двойки
+        Args:
+            value (float): число
+
+        Returns:
+            numerator: числитель
+            scale: степень двойки в знаменателе
+        """
+        numerator, denominator = value.as_integer_ratio()
+        return numerator, denominator.bit_length() - 1
+
+    def add_total(self, numerator, scale):
+        """
+        Добавляет к точной сумме дробь numerator / 2**scale
+        Args:
+            numerator (int): числитель
+            scale (int): степень двойки в знаменателе
+        """
+        if scale > self.scale:
+            self.numerator <<= scale - self.scale
+            self.scale = scale
+        self.numerator += numerator << (self.scale - scale)
+
+    def add(self, salary):
+        """
+        Учитывает очередную зарплату
+        Args:
+            salary: значение зарплаты
+        """
+        numerator, denominator = salary.as_integer_ratio()
+        scale = denominator.bit_length() - 1
+        if scale > self.scale:
+            self.numerator <<= scale - self.scale
+            self.scale = scale
+        self.numerator += numerator << (self.scale - scale)
+        self.count += 1
+        delta = salary - self.running_mean
+        self.running_mean += delta / self.count
+        self.m2 += delta * (salary - self.running_mean)
+        if self.min is None or salary < self.min:
+            self.min = salary
+        if self.max is None or salary > self.max:
+            self.max = salary
+        if self.sketch is not None:
+            self.sketch.add(salary)
+
+    def merge(self, other):
+        """
+        Объединяет статистику с другим объектом SalaryStat (например, посчитанным по другой части файла)
+        Args:
+            other (SalaryStat): статистика, которую нужно добавить к текущей
+        """
+        if other.count == 0:
+            return
+        if other.sketch is not None:
+            if self.sketch is None:
+                self.sketch = SalarySketch()
+            self.sketch.merge(other.sketch)
+        self.add_total(other.numerator, other.scale)
+        if self.count == 0:
+            self.count, self.running_mean = other.count, other.running_mean
+            self.min, self.max, self.m2 = other.min, other.max, other.m2
+            return
+        delta = other.running_mean - self.running_mean
+        count = self.count + other.count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.running_mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def from_totals(cls, count, numerator, scale, minimum, maximum, m2=0.0):
+        """
+        Создаёт объект SalaryStat по уже посчитанным итогам (например, по сгруппированным массивам)
+        Args:
+            count: количество зарплат
+            numerator: числитель точной суммы зарплат
+            scale: степень двойки в знаменателе точной суммы
+            minimum: минимальная зарплата
+            maximum: максимальная зарплата
+            m2: сумма квадратов отклонений от среднего
+
+        Returns:
+            SalaryStat
+        """
+        stat = cls()
+        stat.count, stat.numerator, stat.scale = count, numerator, scale
+        stat.min, stat.max, stat.m2 = minimum, maximum, m2
+        stat.running_mean = stat.mean
+        return stat
+
+    @property
+    def sum(self):
+        """Сумма учтённых зарплат (точная сумма, округлённая до float)"""
+        return self.numerator / (1 << self.scale)
+
+    @property
+    def mean(self):
+        """Средняя зарплата (точное среднее, округлённое до float)"""
+        return self.numerator / (self.count << self.scale)
+
+    @property
+    def variance(self):
+        """Выборочная дисперсия зарплат"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        """
+        Возвращает приближённое значение процентиля по гистограмме (в пределах от min до max)
+        Args:
+            q (float): уровень процентиля от 0 до 1
+
+        Returns:
+            float: значение процентиля (None, если гистограммы нет или она пуста)
+        """
+        value = self.sketch.quantile(q) if self.sketch is not None else None
+        if value is None:
+            return None
+        return min(max(value, self.min), self.max)
+
+
 class SalaryDict:
     """
     Вспомогательный класс для обработки информации о зарплате
     Attributes:
-        salary_dict: данные о всех существующих на сайте зарплатах для заданного key (в качестве ключей выступают города)
+        salary_dict: накопительная статистика (SalaryStat) о всех существующих на сайте зарплатах для заданного key
+        (в качестве ключей выступают города или годы)
         __aver_salary_dict: словарь с данными о средней зарплате для каждого key из salary_dict
     """
     def __init__(self):
@@ -169,20 +933,33 @@ class SalaryDict:
 
     def add_salary(self, key, salary):
         """
-        Добавляет salary в список зарплат по заданному key или инициализирует список зарплат для данного key
+        Учитывает salary в статистике зарплат по заданному key или инициализирует статистику для данного key
         Args:
             key: ключ, по которому нужно добавить salary в словарь salary_dict
             salary: значение добавляемой в словарь зарплаты
 
         """
-        if self.salary_dict.get(key) is None:
-            self.salary_dict[key] = []
-        return self.salary_dict[key].append(salary)
+        stat = self.salary_dict.get(key)
+        if stat is None:
+            stat = self.salary_dict[key] = SalaryStat()
+        stat.add(salary)
+
+    def merge(self, other):
+        """
+        Добавляет к текущему объекту статистику из другого объекта SalaryDict
+        Args:
+            other (SalaryDict): объект, статистику которого нужно добавить
+        """
+        for key, other_stat in other.salary_dict.items():
+            stat = self.salary_dict.get(key)
+            if stat is None:
+                stat = self.salary_dict[key] = SalaryStat()
+            stat.merge(other_stat)
 
     def get_aver_salary(self):
         """Возвращает словарь с данными о средней зарплате для каждого key из salary_dict"""
         for key, value in self.salary_dict.items():
-            self.__aver_salary_dict[key] = int(mean(value))
+            self.__aver_salary_dict[key] = int(value.mean)
         return self.__aver_salary_dict
 
 
@@ -210,12 +987,20 @@ class CountDict:
         Args:
             key: название заданного города
         """
-        if self.count_dict.get(key) is None:
-            self.count_dict[key] = 0
-        self.count_dict[key] += 1
+        self.count_dict[key] = self.count_dict.get(key, 0) + 1
         self.length += 1
         return
 
+    def merge(self, other):
+        """
+        Добавляет к текущему объекту количества из другого объекта CountDict
+        Args:
+            other (CountDict): объект, количества которого нужно добавить
+        """
+        for key, value in other.count_dict.items():
+            self.count_dict[key] = self.count_dict.get(key, 0) + value
+        self.length += other.length
+
     def get_proportion(self):
         """Обновляет top_proportion_dict для заданного объекта CountDict"""
         proportion_dict = {}
@@ -229,19 +1014,217 @@ class CountDict:
         return
 
 
+class CurrencyRates(dict):
+    """
+    Курсы валют к рублю, зависящие от месяца публикации вакансии. Сам объект - словарь-индекс
+    (валюта, месяц 'ГГГГ-ММ') -> курс, который заполняется при первом обращении к паре, поэтому перевод
+    зарплаты стоит одного поиска в словаре, сколько бы точек ни было в таблице курсов. Для месяца без курса
+    берётся последний известный курс до него (для месяцев раньше первого курса - первый курс),
+    а для валюты, которой нет в таблице, - постоянный курс
+    Attributes:
+        fixed: валюта -> постоянный курс
+        points: валюта -> (отсортированный список месяцев, список курсов)
+        digest: хэш таблицы курсов (пустая строка для постоянных курсов)
+    """
+    month_pattern = re.compile(r'\d{4}-(0[1-9]|1[0-2])')
+
+    def __init__(self, fixed, points=None, digest=''):
+        """
+        Инициализирует объект CurrencyRates
+        Args:
+            fixed (dict): валюта -> постоянный курс
+            points (dict): валюта -> (отсортированный список месяцев, список курсов)
+            digest (str): хэш таблицы курсов
+        """
+        super().__init__()
+        self.fixed = dict(fixed)
+        self.points = points or {}
+        self.digest = digest
+
+    @property
+    def is_fixed(self):
+        """Возвращает True, если курсы не зависят от месяца"""
+        return not self.points
+
+    def __missing__(self, key):
+        """
+        Находит курс для пары (валюта, месяц), которой ещё нет в индексе, и запоминает его
+        Args:
+            key: кортеж (валюта, месяц)
+
+        Returns:
+            float: курс валюты к рублю
+        """
+        currency, month = key
+        points = self.points.get(currency)
+        if points is None:
+            rate = self.fixed[currency]
+        else:
+            months, rates = points
+            rate = rates[max(bisect.bisect_right(months, month) - 1, 0)]
+        self[key] = rate
+        return rate
+
+    def table(self, currency_keys, month_keys):
+        """
+        Возвращает матрицу курсов для векторного перевода зарплат в рубли
+        Args:
+            currency_keys: валюты (строки матрицы)
+            month_keys: месяцы (столбцы матрицы)
+
+        Returns:
+            массив NumPy размера len(currency_keys) x len(month_keys)
+        """
+        import numpy as np
+        return np.array([[self[currency, month] for month in month_keys] for currency in currency_keys],
+                        dtype=float).reshape(len(currency_keys), len(month_keys))
+
+    @classmethod
+    def from_file(cls, file_name, fixed):
+        """
+        Загружает таблицу курсов из csv-файла со столбцами currency, date, rate или из JSON-файла вида
+        {"USD": {"2019-01": 65.2, ...}, ...}. Дата указывается как 'ГГГГ-ММ' или 'ГГГГ-ММ-ДД',
+        несколько курсов за один месяц усредняются
+        Args:
+            file_name (str): имя файла с курсами
+            fixed (dict): постоянные курсы для валют, которых нет в таблице
+
+        Returns:
+            CurrencyRates
+        """
+        try:
+            with open(file_name, 'rb') as file:
+                content = file.read()
+            if file_name.lower().endswith('.json'):
+                records = [(currency, date, rate) for currency, table in json.loads(content).items()
+                           for date, rate in table.items()]
+            else:
+                reader = csv.DictReader(content.decode('utf_8_sig').splitlines())
+                records = [(row['currency'], row['date'], row['rate']) for row in reader]
+            by_month = {}
+            for currency, date, rate in records:
+                month, rate = date[:7], float(rate)
+                if cls.month_pattern.fullmatch(month) is None or not rate > 0:
+                    raise ValueError(date)
+                total = by_month.setdefault(currency, {}).setdefault(month, [0.0, 0])
+                total[0] += rate
+                total[1] += 1
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            print('Некорректный файл курсов валют')
+            sys.exit(1)
+        points = {currency: (sorted(months), [months[month][0] / months[month][1] for month in sorted(months)])
+                  for currency, months in by_month.items()}
+        return cls(fixed, points, hashlib.blake2b(content, digest_size=20).hexdigest())
+
+
+class VacancyFilter:
+    """
+    Отбор вакансий по году публикации, региону и валюте
+    Attributes:
+        years: кортеж (первый год, последний год) включительно или None, если год не важен
+        areas: множество регионов или None, если регион не важен
+        currencies: множество валют или None, если валюта не важна
+    """
+    def __init__(self, years=None, areas=None, currencies=None):
+        """
+        Инициализирует объект VacancyFilter
+        Args:
+            years: кортеж (первый год, последний год) включительно
+            areas: регионы
+            currencies: валюты
+        """
+        self.years = years
+        self.areas = frozenset(areas) if areas else None
+        self.currencies = frozenset(currencies) if currencies else None
+
+    @property
+    def is_empty(self):
+        """Возвращает True, если фильтр пропускает все вакансии"""
+        return self.years is None and self.areas is None and self.currencies is None
+
+    def matches(self, vacancy):
+        """
+        Проверяет, подходит ли вакансия под фильтр
+        Args:
+            vacancy (VacancyRecord): вакансия
+
+        Returns:
+            bool
+        """
+        return ((self.years is None or self.years[0] <= vacancy.published_at <= self.years[1])
+                and (self.areas is None or vacancy.area_name in self.areas)
+                and (self.currencies is None or vacancy.salary_currency in self.currencies))
+
+    def apply(self, vacancies):
+        """
+        Отбирает подходящие вакансии
+        Args:
+            vacancies: итерируемый объект объектов типа VacancyRecord
+
+        Returns:
+            итерируемый объект подходящих вакансий
+        """
+        return vacancies if self.is_empty else filter(self.matches, vacancies)
+
+    def get_excluded_areas(self, excluded_areas):
+        """
+        Возвращает регионы, не участвующие в рейтингах по городам: явно выбранные в фильтре регионы
+        в рейтингах остаются, даже если обычно исключаются
+        Args:
+            excluded_areas: регионы, исключаемые из рейтингов по умолчанию
+
+        Returns:
+            frozenset
+        """
+        return frozenset(excluded_areas) - (self.areas or frozenset())
+
+    @staticmethod
+    def parse_years(value):
+        """
+        Разбирает диапазон лет из строки вида '2019-2022' или '2019'
+        Args:
+            value (str): диапазон лет
+
+        Returns:
+            кортеж (первый год, последний год)
+        """
+        match = re.fullmatch(r'\s*(\d{4})\s*(?:-\s*(\d{4})\s*)?', value)
+        if match is None or int(match.group(1)) > int(match.group(2) or match.group(1)):
+            raise argparse.ArgumentTypeError('Некорректный диапазон лет')
+        return int(match.group(1)), int(match.group(2) or match.group(1))
+
+
 class ParseData:
     """
     Класс для представления данных о зарплате и вакансиях, полученных из csv-файла
     Attributes:
         currency_to_rub: словарь для перевода любой валюты в рубли, key - название валюты, value - значение в рублях
         денежной единицы
+        currency_rates: объект CurrencyRates, через который переводятся зарплаты (по умолчанию - постоянные
+        курсы currency_to_rub; заменяется таблицей курсов по месяцам)
         salary_lvl_by_year: уровень зарплаты по всем профессиям в этом году
         count_vac_by_year: общее количество опубликованных вакансий в этом году
         salary_lvl_by_year_for_prof: уровень зарплаты в данной профессии в этом году
         count_vac_by_year_for_prof: количество опубликованных вакансий с данной профессией в этом году
         salary_lvl_by_city: уровень зарплаты по городу
         vacancy_rate_by_city: уровень вакансий по городу
+        top_count: количество городов в рейтингах по городам
+        share_threshold: минимальная доля вакансий города для попадания в рейтинги
+        excluded_areas: регионы, которые не участвуют в рейтингах по городам
+        percentiles: уровни процентилей зарплат (при включённом SalaryStat.sketches)
+        distribution: процентили и гистограммы зарплат, посчитанные get_results (None, если SalaryStat.sketches
+        выключен)
+        vacancy_filter: объект VacancyFilter, по которому отбираются учитываемые вакансии (None - все вакансии)
+        validator: объект RowValidator со счётчиками отклонённых строк, если статистика собрана по частям файла
+        или по строкам, прочитанным в compute_data (None - строки проверялись в другом месте или не читались)
     """
+    top_count = 10
+    percentiles = (0.1, 0.5, 0.9)
+    distribution = None
+    vacancy_filter = None
+    validator = None
+    share_threshold = 0.01
+    excluded_areas = frozenset({'Россия'})
     currency_to_rub = {'AZN': 35.68,
                        'BYR': 23.91,
                        'EUR': 59.90,
@@ -252,9 +1235,15 @@ class ParseData:
                        'UAH': 1.64,
                        'USD': 60.66,
                        'UZS': 0.0055}
+    currency_rates = CurrencyRates(currency_to_rub)
 
-    def __init__(self):
-        """Инициализирует объект класса ParseData"""
+    def __init__(self, vacancy_filter=None):
+        """
+        Инициализирует объект класса ParseData
+        Args:
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий по году, региону и валюте
+        """
+        self.vacancy_filter = vacancy_filter if vacancy_filter is not None and not vacancy_filter.is_empty else None
         self.salary_lvl_by_year = SalaryDict()
         self.count_vac_by_year = CountDict()
         self.salary_lvl_by_year_for_prof = SalaryDict()
@@ -267,119 +1256,1336 @@ class ParseData:
         Возвращает обновлённые значения всех аттрибутов объекта class ParseData
 
         Args:
-            vacancies: список объектов типа Vacancy, содержащий данные о вакансиях
-            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+            vacancies: список объектов типа Vacancy, содержащий данные о вакансиях
+            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+        """
+        self.inspection_vacancy(prof, vacancies)
+        return self.get_results()
+
+    def get_results(self):
+        """Возвращает итоговые значения всех аттрибутов объекта class ParseData по уже накопленным данным"""
+        self.checked_salary()
+        salary_by_city = self.salary_lvl_by_city
+        excluded_areas = None
+        if self.vacancy_filter is not None:
+            excluded_areas = self.vacancy_filter.get_excluded_areas(ParseData.excluded_areas)
+        self.salary_lvl_by_city, list_del_town = self.get_top_aver_salary(self.salary_lvl_by_city,
+                                                                          excluded_areas=excluded_areas)
+        if SalaryStat.sketches:
+            self.distribution = self.get_distribution(salary_by_city, self.salary_lvl_by_city)
+        self.vacancy_rate_by_city = self.get_top_rate_by_city(self.vacancy_rate_by_city, excluded_areas=excluded_areas)
+        self.vacancy_rate_by_city = dict((x, y) for x, y in self.vacancy_rate_by_city)
+        return self.salary_lvl_by_year.get_aver_salary(), self.count_vac_by_year.count_dict, \
+               self.salary_lvl_by_year_for_prof.get_aver_salary(), self.count_vac_by_year_for_prof.count_dict, \
+               self.salary_lvl_by_city, self.vacancy_rate_by_city
+
+    def get_distribution(self, salary_by_city, cities):
+        """
+        Возвращает процентили зарплат по годам (всего и для профессии) и по городам, а также гистограммы
+        зарплат по всем вакансиям и по вакансиям профессии
+        Args:
+            salary_by_city (SalaryDict): статистика зарплат по всем городам
+            cities: города, для которых нужны процентили
+
+        Returns:
+            dict: 'by_year', 'by_year_for_prof', 'by_city' - ключ -> кортеж процентилей (ParseData.percentiles),
+            'histogram', 'histogram_for_prof' - списки (нижняя граница, верхняя граница, количество)
+        """
+        def get_percentiles(stat):
+            return tuple(int(stat.quantile(q) or 0) for q in self.percentiles)
+
+        def get_histogram(salary_dict):
+            sketch = SalarySketch()
+            for stat in salary_dict.salary_dict.values():
+                if stat.sketch is not None:
+                    sketch.merge(stat.sketch)
+            return sketch.histogram()
+
+        return {'by_year': {key: get_percentiles(stat) for key, stat in self.salary_lvl_by_year.salary_dict.items()},
+                'by_year_for_prof': {key: get_percentiles(stat)
+                                     for key, stat in self.salary_lvl_by_year_for_prof.salary_dict.items()},
+                'by_city': {city: get_percentiles(salary_by_city.salary_dict[city]) for city in cities},
+                'histogram': get_histogram(self.salary_lvl_by_year),
+                'histogram_for_prof': get_histogram(self.salary_lvl_by_year_for_prof)}
+
+    def checked_salary(self):
+        """Проверяет, совпадает ли количество данных по вакансиям и зарплатам
+         в атрибутах текущего объекта и, если нет, добавляет недостающие"""
+        if self.salary_lvl_by_year_for_prof.salary_dict == {}:
+            for key in self.salary_lvl_by_year.salary_dict.keys():
+                self.salary_lvl_by_year_for_prof.add_salary(key, 0)
+        elif len(self.salary_lvl_by_year.salary_dict) != len(self.salary_lvl_by_year_for_prof.salary_dict):
+            aver_salary_for_prof = self.salary_lvl_by_year_for_prof.get_aver_salary()
+            for key in self.salary_lvl_by_year.salary_dict.keys():
+                if key not in aver_salary_for_prof:
+                    aver_salary_for_prof[key] = 0
+        if self.count_vac_by_year_for_prof.count_dict == {}:
+            self.count_vac_by_year_for_prof.count_dict = {x: 0 for x in self.count_vac_by_year.count_dict.keys()}
+        elif self.count_vac_by_year_for_prof.count_dict != {} and len(
+                list(self.count_vac_by_year.count_dict.keys())) != len(
+            list(self.count_vac_by_year_for_prof.count_dict.keys())):
+            for key in list(self.count_vac_by_year.count_dict.keys()):
+                if key not in list(self.count_vac_by_year_for_prof.count_dict.keys()):
+                    self.count_vac_by_year_for_prof.count_dict[key] = 0
+
+    def inspection_vacancy(self, prof, vacancies):
+        """
+        Вносит информацию о вакансиях и переданной профессии в атрибуты текущего объекта
+        Args:
+            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+            vacancies: итерируемый объект (список или генератор) объектов типа VacancyRecord
+
+        Returns:
+
+        """
+        rates = ParseData.currency_rates
+        if self.vacancy_filter is not None:
+            vacancies = self.vacancy_filter.apply(vacancies)
+        for vacancy in vacancies:
+            vacancy_salary = (vacancy.salary_from + vacancy.salary_to) / 2 * rates[vacancy.salary_currency, vacancy.month]
+            self.salary_lvl_by_year.add_salary(vacancy.published_at, vacancy_salary)
+            self.count_vac_by_year.add(vacancy.published_at)
+            self.salary_lvl_by_city.add_salary(vacancy.area_name, vacancy_salary)
+            self.vacancy_rate_by_city.add(vacancy.area_name)
+            if prof in vacancy.name:
+                self.salary_lvl_by_year_for_prof.add_salary(vacancy.published_at, vacancy_salary)
+                self.count_vac_by_year_for_prof.add(vacancy.published_at)
+
+    def merge(self, other):
+        """
+        Добавляет к текущему объекту данные, накопленные другим объектом ParseData
+        Args:
+            other (ParseData): объект с данными по другой части вакансий
+        """
+        self.salary_lvl_by_year.merge(other.salary_lvl_by_year)
+        self.count_vac_by_year.merge(other.count_vac_by_year)
+        self.salary_lvl_by_year_for_prof.merge(other.salary_lvl_by_year_for_prof)
+        self.count_vac_by_year_for_prof.merge(other.count_vac_by_year_for_prof)
+        self.salary_lvl_by_city.merge(other.salary_lvl_by_city)
+        self.vacancy_rate_by_city.merge(other.vacancy_rate_by_city)
+
+    @staticmethod
+    def init_worker(currency_rates, sketches):
+        """
+        Передаёт процессу пула настройки родительского процесса (вызывается один раз при запуске процесса)
+        Args:
+            currency_rates (CurrencyRates): курсы валют
+            sketches (bool): собирать ли гистограммы зарплат
+        """
+        ParseData.currency_rates = currency_rates
+        SalaryStat.sketches = sketches
+
+    @staticmethod
+    def inspect_chunk(task):
+        """
+        Обрабатывает одну часть csv-файла (выполняется в отдельном процессе)
+        Args:
+            task: кортеж (имя файла, начало, конец, названия столбцов, профессия, фильтр вакансий,
+            файл карантина этой части)
+
+        Returns:
+            ParseData: объект с данными по этой части файла
+            RowValidator: проверка строк этой части со счётчиками отклонённых строк
+        """
+        file_name, start, end, columns_names, prof, vacancy_filter, quarantine = task
+        data = ParseData(vacancy_filter)
+        validator = RowValidator(columns_names, quarantine=quarantine)
+        rows = DataSet.read_chunk(file_name, start, end, columns_names, validator)
+        data.inspection_vacancy(prof, VacancyRecord.from_rows(columns_names, rows))
+        return data, validator
+
+    @staticmethod
+    def inspect_shard(task):
+        """
+        Обрабатывает один файл-часть целиком, распаковывая его на лету (выполняется в отдельном процессе)
+        Args:
+            task: кортеж (имя файла, ожидаемый заголовок, профессия, фильтр вакансий, файл карантина этой части)
+
+        Returns:
+            columns_names: заголовок файла (None для пустого файла); если он отличается от ожидаемого,
+            файл не обрабатывается
+            ParseData: объект с данными по этому файлу
+            RowValidator: проверка строк этого файла со счётчиками отклонённых строк
+        """
+        shard, header, prof, vacancy_filter, quarantine = task
+        data = ParseData(vacancy_filter)
+        validator = RowValidator(header, quarantine=quarantine)
+        rows = DataSet.read_csv(shard)
+        columns_names = next(rows, None)
+        if columns_names is not None and columns_names == header:
+            data.inspection_vacancy(prof, VacancyRecord.from_rows(columns_names, validator.validate(rows)))
+        return columns_names, data, validator
+
+    @classmethod
+    def from_shards(cls, shards, prof, workers=None, vacancy_filter=None, quarantine=None):
+        """
+        Обрабатывает файлы-части в пуле из не более чем workers процессов (по одной задаче на часть)
+        и объединяет результаты в порядке следования частей, проверяя совпадение заголовков
+        Args:
+            shards (list): имена файлов-частей (в том числе сжатых)
+            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+            workers (int): количество процессов (по умолчанию - количество ядер процессора)
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+            quarantine (str): имя csv-файла для отклонённых строк (части пишут свои файлы, которые затем
+            объединяются в порядке частей)
+
+        Returns:
+            ParseData: объект с данными по всем частям (в validator - счётчики отклонённых строк)
+        """
+        columns_names = next(filter(None, (next(DataSet.read_csv(shard), None) for shard in shards)), None)
+        if columns_names is None:
+            print('Пустой файл')
+            sys.exit(1)
+        workers = max(min(workers or os.cpu_count() or 1, len(shards)), 1)
+        tasks = [(shard, columns_names, prof, vacancy_filter, quarantine and f'{quarantine}.part{number}')
+                 for number, shard in enumerate(shards)]
+        result = cls(vacancy_filter)
+        result.validator = RowValidator(columns_names, quarantine=quarantine)
+
+        def merge(parts):
+            for shard, (header, part, validator) in zip(shards, parts):
+                if header is not None:
+                    DataSet.check_header(columns_names, header, shard)
+                    result.merge(part)
+                    result.validator.merge(validator)
+
+        if workers == 1:
+            merge(map(cls.inspect_shard, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=cls.init_worker,
+                                     initargs=(cls.currency_rates, SalaryStat.sketches)) as executor:
+                merge(executor.map(cls.inspect_shard, tasks))
+        if result.count_vac_by_year.length == 0:
+            print('Нет данных')
+            sys.exit(1)
+        return result
+
+    @classmethod
+    def from_file_parallel(cls, file_name, prof, workers=None, vacancy_filter=None, quarantine=None):
+        """
+        Параллельно обрабатывает csv-файл в пуле процессов: файл делится на части по границам строк,
+        каждая часть обрабатывается отдельно, а результаты объединяются в порядке следования частей,
+        поэтому итог совпадает с последовательной обработкой. Сжатый файл и набор файлов-частей
+        делятся по файлам (from_shards)
+        Args:
+            file_name (str): имя csv-файла, папки или шаблон имени с файлами-частями
+            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+            workers (int): количество процессов (по умолчанию - количество ядер процессора)
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+            quarantine (str): имя csv-файла для отклонённых строк (части пишут свои файлы, которые затем
+            объединяются в порядке частей)
+
+        Returns:
+            ParseData: объект с данными по всему файлу (в validator - счётчики отклонённых строк)
+        """
+        shards = DataSet.expand_sources(file_name)
+        if len(shards) > 1 or DataSet.is_compressed(shards[0]):
+            return cls.from_shards(shards, prof, workers, vacancy_filter, quarantine)
+        workers = workers or os.cpu_count() or 1
+        columns_names, chunks = DataSet.split_into_chunks(file_name, workers * 4)
+        if columns_names is None:
+            print('Пустой файл')
+            sys.exit(1)
+        tasks = [(file_name, start, end, columns_names, prof, vacancy_filter, quarantine and f'{quarantine}.part{number}')
+                 for number, (start, end) in enumerate(chunks)]
+        result = cls(vacancy_filter)
+        result.validator = RowValidator(columns_names, quarantine=quarantine)
+        if workers == 1:
+            for part, validator in map(cls.inspect_chunk, tasks):
+                result.merge(part)
+                result.validator.merge(validator)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=cls.init_worker,
+                                     initargs=(cls.currency_rates, SalaryStat.sketches)) as executor:
+                for part, validator in executor.map(cls.inspect_chunk, tasks):
+                    result.merge(part)
+                    result.validator.merge(validator)
+        if result.count_vac_by_year.length == 0:
+            print('Нет данных')
+            sys.exit(1)
+        return result
+
+    @staticmethod
+    def get_top_aver_salary(list_all_salary, top_count=None, share_threshold=None, excluded_areas=None):
+        """
+        Возвращает топ городов с самым высоким значением средней зарплаты по городу и список исключённых городов.
+        Учитываются только города, доля вакансий в которых (в процентах, округлённая до десятых) не меньше порога
+        Args:
+            list_all_salary: данные о зарплатах для каждого города
+            top_count (int): количество городов в топе (по умолчанию ParseData.top_count)
+            share_threshold (float): минимальная доля вакансий города (по умолчанию ParseData.share_threshold)
+            excluded_areas: регионы, не участвующие в рейтинге (по умолчанию ParseData.excluded_areas)
+        """
+        top_count = ParseData.top_count if top_count is None else top_count
+        share_threshold = ParseData.share_threshold if share_threshold is None else share_threshold
+        excluded_areas = ParseData.excluded_areas if excluded_areas is None else excluded_areas
+
+        total = sum(stat.count for stat in list_all_salary.salary_dict.values())
+        list_del_town = []
+        candidates = []
+        for town, stat in list_all_salary.salary_dict.items():
+            if round(100 * stat.count / total, 1) < 100 * share_threshold or town in excluded_areas:
+                list_del_town.append((town, stat.count))
+            else:
+                candidates.append((town, int(stat.mean)))
+        return dict(heapq.nlargest(top_count, candidates, key=itemgetter(1))), list_del_town
+
+    @staticmethod
+    def get_top_rate_by_city(vacancy_rate_by_city, top_count=None, share_threshold=None, excluded_areas=None):
+        """
+        Возвращает топ городов с самой большой долей вакансий (доля считается от общего количества вакансий)
+        Args:
+            vacancy_rate_by_city: объект CountDict с данными о количестве вакансий для каждого города
+            top_count (int): количество городов в топе (по умолчанию ParseData.top_count)
+            share_threshold (float): минимальная доля вакансий города (по умолчанию ParseData.share_threshold)
+            excluded_areas: регионы, не участвующие в рейтинге (по умолчанию ParseData.excluded_areas)
+        """
+        top_count = ParseData.top_count if top_count is None else top_count
+        share_threshold = ParseData.share_threshold if share_threshold is None else share_threshold
+        excluded_areas = ParseData.excluded_areas if excluded_areas is None else excluded_areas
+
+        total = vacancy_rate_by_city.length
+        candidates = [(town, round(count / total, 4)) for town, count in vacancy_rate_by_city.count_dict.items()
+                      if count / total >= share_threshold and town not in excluded_areas]
+        return heapq.nlargest(top_count, candidates, key=itemgetter(1))
+
+
+class ColumnStore:
+    """
+    Бинарное колоночное хранилище вакансий: папка с массивами NumPy (.npy) по столбцам и файлом meta.json.
+    Столбцы name, salary_currency, area_name, published_at (год) и month (месяц) хранятся словарным кодированием:
+    в массиве - коды, а сами значения - в словаре, упорядоченном по первому появлению в исходном файле.
+    Массивы открываются с отображением в память, поэтому загрузка не копирует данные, а несколько процессов
+    используют общий страничный кэш. Для столбцов, по которым фильтруются вакансии (indexed), при создании
+    хранилища записывается индекс: номера строк, упорядоченные по коду (<столбец>.order.npy), и границы
+    диапазона каждого кода в этом порядке (<столбец>.bounds.npy)
+    Attributes:
+        directory: папка хранилища
+        columns_names: названия столбцов в строках, которые отдаёт хранилище
+        stored_columns: названия сохраняемых столбцов (в хранилищах старого формата нет столбца month)
+        rows_count: количество вакансий
+        dictionaries: название столбца -> список значений для словарно закодированных столбцов
+        columns: название столбца -> массив NumPy, отображённый в память
+        indexes: название столбца -> (номера строк по коду, границы кодов), отображённые в память
+            (в хранилищах, созданных без индексов, - пустой словарь)
+    """
+    meta_name = 'meta.json'
+    columns_names = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+    stored_columns = columns_names + ['month']
+    encoded = ('name', 'salary_currency', 'area_name', 'published_at', 'month')
+    indexed = ('published_at', 'area_name', 'salary_currency')
+
+    def __init__(self, directory):
+        """
+        Открывает колоночное хранилище
+        Args:
+            directory (str): папка хранилища
+        """
+        import numpy as np
+        self.directory = directory
+        with open(os.path.join(directory, self.meta_name), encoding='utf_8') as file:
+            meta = json.load(file)
+        self.rows_count = meta['rows_count']
+        self.dictionaries = meta['dictionaries']
+        self.columns = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+                        for name in self.stored_columns if name in self.dictionaries or name not in self.encoded}
+        self.indexes = {name: tuple(np.load(os.path.join(directory, f'{name}.{part}.npy'), mmap_mode='r')
+                                    for part in ('order', 'bounds'))
+                        for name in self.indexed if os.path.isfile(os.path.join(directory, f'{name}.order.npy'))}
+
+    @staticmethod
+    def get_predicates(vacancy_filter):
+        """
+        Возвращает проверки значений года, региона и валюты по фильтру (None - значение не проверяется)
+        Args:
+            vacancy_filter (VacancyFilter): фильтр вакансий
+
+        Returns:
+            кортеж из трёх функций или None
+        """
+        years, areas, currencies = vacancy_filter.years, vacancy_filter.areas, vacancy_filter.currencies
+        return (None if years is None else lambda year: years[0] <= int(year) <= years[1],
+                None if areas is None else areas.__contains__,
+                None if currencies is None else currencies.__contains__)
+
+    def select_rows(self, vacancy_filter):
+        """
+        Находит номера строк, подходящих под фильтр: проверка выполняется один раз для каждого значения
+        в словаре столбца. Строки самого избирательного условия берутся из индекса столбца (диапазоны
+        допустимых кодов), а остальные условия проверяются только для них - по таблице допустимых кодов.
+        Без индексов (хранилище старого формата) проверяются все строки
+        Args:
+            vacancy_filter (VacancyFilter): фильтр вакансий
+
+        Returns:
+            массив номеров строк по возрастанию
+        """
+        import numpy as np
+        checks = [(name, np.array([predicate(key) for key in self.dictionaries[name]], dtype=bool))
+                  for name, predicate in zip(self.indexed, self.get_predicates(vacancy_filter)) if predicate is not None]
+        indexed = [(int(np.diff(self.indexes[name][1])[allowed].sum()), name, allowed)
+                   for name, allowed in checks if name in self.indexes]
+        if not indexed:
+            mask = np.ones(self.rows_count, dtype=bool)
+            for name, allowed in checks:
+                mask &= allowed[self.columns[name]]
+            return np.flatnonzero(mask)
+
+        _, selected, allowed = min(indexed, key=lambda item: item[0])
+        order, bounds = self.indexes[selected]
+        rows = np.sort(np.concatenate([np.empty(0, dtype=np.intp)] + [
+            order[bounds[code]:bounds[code + 1]] for code in np.flatnonzero(allowed).tolist()]))
+        for name, allowed in checks:
+            if name != selected:
+                rows = rows[allowed[self.columns[name][rows]]]
+        return rows
+
+    @classmethod
+    def is_store(cls, path):
+        """Проверяет, является ли path папкой колоночного хранилища"""
+        return os.path.isfile(os.path.join(path, cls.meta_name))
+
+    @classmethod
+    def convert(cls, file_name, directory):
+        """
+        Однократно переводит csv-файл в колоночное хранилище (строки отбираются так же, как в DataSet)
+        Args:
+            file_name (str): имя csv-файла
+            directory (str): папка, в которую записывается хранилище
+
+        Returns:
+            ColumnStore: открытое хранилище
+        """
+        import numpy as np
+        dataset = DataSet(file_name, streaming=True)
+        dictionaries = {name: {} for name in cls.encoded}
+        buffers = {name: array('d' if name in ('salary_from', 'salary_to') else 'q') for name in cls.stored_columns}
+        rows_count = 0
+        for vacancy in VacancyRecord.from_rows(dataset.columns_names, dataset.vacancies_data):
+            for name in cls.stored_columns:
+                value = getattr(vacancy, name)
+                if name in dictionaries:
+                    value = dictionaries[name].setdefault(value, len(dictionaries[name]))
+                buffers[name].append(value)
+            rows_count += 1
+
+        os.makedirs(directory, exist_ok=True)
+        for name, buffer in buffers.items():
+            values = np.frombuffer(buffer, dtype=np.float64 if buffer.typecode == 'd' else np.int64)
+            if name in dictionaries:
+                values = values.astype(np.min_scalar_type(max(len(dictionaries[name]) - 1, 0)))
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+            if name in cls.indexed:
+                order = np.argsort(values, kind='stable').astype(np.min_scalar_type(max(rows_count - 1, 0)))
+                bounds = np.zeros(len(dictionaries[name]) + 1, dtype=np.int64)
+                np.cumsum(np.bincount(values, minlength=len(dictionaries[name])), out=bounds[1:])
+                np.save(os.path.join(directory, f'{name}.order.npy'), order)
+                np.save(os.path.join(directory, f'{name}.bounds.npy'), bounds)
+        meta = {'rows_count': rows_count, 'dictionaries': {name: list(keys) for name, keys in dictionaries.items()}}
+        with open(os.path.join(directory, cls.meta_name), 'w', encoding='utf_8') as file:
+            json.dump(meta, file, ensure_ascii=False)
+        return cls(directory)
+
+    def __iter__(self):
+        """
+        Возвращает строки в текстовом виде, как если бы они были прочитаны из csv-файла
+        (дата публикации восстанавливается как первое число месяца публикации, а в хранилищах
+        старого формата - как 1 января года публикации)
+        """
+        name_keys = self.dictionaries['name']
+        currency_keys = self.dictionaries['salary_currency']
+        area_keys = self.dictionaries['area_name']
+        if 'month' in self.columns:
+            date_keys, dates = self.dictionaries['month'], self.columns['month']
+        else:
+            date_keys, dates = [f'{year}-01' for year in self.dictionaries['published_at']], self.columns['published_at']
+        columns = [self.columns[name].tolist() for name in self.columns_names[:-1]] + [dates.tolist()]
+        for name, salary_from, salary_to, currency, area, date in zip(*columns):
+            yield [name_keys[name], repr(salary_from), repr(salary_to), currency_keys[currency], area_keys[area],
+                   f'{date_keys[date]}-01T00:00:00+0000']
+
+
+class ColumnarData:
+    """
+    Колоночное представление вакансий на массивах NumPy: вместо объектов Vacancy данные хранятся
+    в виде отдельных массивов по столбцам, а группировка по годам и городам выполняется векторно
+    Attributes:
+        name_codes: коды названий вакансий (номера в name_keys)
+        name_keys: названия вакансий в порядке первого появления в файле
+        salary: массив средних зарплат в рублях
+        years: коды годов публикации (номера в year_keys)
+        year_keys: годы публикации в порядке первого появления в файле
+        areas: коды городов (номера в area_keys)
+        area_keys: города в порядке первого появления в файле
+    """
+    def __init__(self, columns_names, rows, vacancy_filter=None):
+        """
+        Инициализирует объект ColumnarData, раскладывая строки csv-файла по столбцам
+        Args:
+            columns_names (list): названия столбцов в csv-файле
+            rows: итерируемый объект с уже отобранными строками csv-файла
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+        """
+        import numpy as np
+        needed = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+        indexes = [columns_names.index(name) for name in needed]
+        columns = [[] for _ in needed]
+        appends = [column.append for column in columns]
+        for row in rows:
+            for append, index in zip(appends, indexes):
+                append(row[index])
+        names, salary_from, salary_to, currency, area, published_at = columns
+
+        self.name_keys, self.name_codes = self.factorize(np.array(names, dtype=str))
+        currency_keys, currency_codes = self.factorize(np.array(currency, dtype=str))
+        published_at = np.array(published_at, dtype=str)
+        if ParseData.currency_rates.is_fixed:
+            month_keys, month_codes = [None], np.zeros(len(published_at), dtype=np.intp)
+        else:
+            month_keys, month_codes = self.factorize(published_at.astype('U7'))
+        rates = ParseData.currency_rates.table(currency_keys, month_keys)
+        self.salary = ((np.array(salary_from, dtype=float) + np.array(salary_to, dtype=float)) / 2
+                       * rates[currency_codes, month_codes])
+        self.year_keys, self.years = self.factorize(published_at.astype('U4').astype(int))
+        self.area_keys, self.areas = self.factorize(np.array(area, dtype=str))
+        if vacancy_filter is not None and not vacancy_filter.is_empty:
+            mask = np.ones(len(self.salary), dtype=bool)
+            for keys, codes, predicate in zip((self.year_keys, self.area_keys, currency_keys),
+                                              (self.years, self.areas, currency_codes),
+                                              ColumnStore.get_predicates(vacancy_filter)):
+                if predicate is not None:
+                    mask &= np.array([predicate(key) for key in keys], dtype=bool)[codes]
+            self.salary, self.name_codes = self.salary[mask], self.name_codes[mask]
+            self.years, self.areas = self.years[mask], self.areas[mask]
+
+    @classmethod
+    def from_store(cls, store, vacancy_filter=None):
+        """
+        Создаёт объект ColumnarData по бинарному колоночному хранилищу без разбора текста: коды годов, городов
+        и названий уже упорядочены по первому появлению и используются напрямую из отображённых в память массивов.
+        При заданном фильтре подходящие строки находятся по кодам столбцов хранилища (ColumnStore.select_rows),
+        и читаются только они
+        Args:
+            store (ColumnStore): колоночное хранилище
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+
+        Returns:
+            ColumnarData
+        """
+        import numpy as np
+        rows = None
+        if vacancy_filter is not None and not vacancy_filter.is_empty:
+            rows = store.select_rows(vacancy_filter)
+
+        def column(name):
+            return store.columns[name] if rows is None else store.columns[name][rows]
+
+        data = cls.__new__(cls)
+        if ParseData.currency_rates.is_fixed:
+            month_keys, month_codes = [None], np.zeros(store.rows_count if rows is None else len(rows), dtype=np.intp)
+        elif 'month' in store.columns:
+            month_keys, month_codes = store.dictionaries['month'], column('month')
+        else:
+            print('Хранилище создано без месяцев публикации: пересоздайте его для курсов валют по месяцам')
+            sys.exit(1)
+        rates = ParseData.currency_rates.table(store.dictionaries['salary_currency'], month_keys)
+        data.salary = (column('salary_from') + column('salary_to')) / 2 * rates[column('salary_currency'), month_codes]
+        data.name_keys, data.name_codes = store.dictionaries['name'], column('name')
+        data.year_keys, data.years = store.dictionaries['published_at'], column('published_at')
+        data.area_keys, data.areas = store.dictionaries['area_name'], column('area_name')
+        return data
+
+    @staticmethod
+    def factorize(values):
+        """
+        Заменяет значения массива кодами, нумеруя уникальные значения в порядке их первого появления
+        Args:
+            values: массив значений
+
+        Returns:
+            keys: список уникальных значений
+            codes: массив кодов той же длины, что и values
+        """
+        import numpy as np
+        uniques, first_index, codes = np.unique(values, return_index=True, return_inverse=True)
+        order = np.argsort(first_index, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return uniques[order].tolist(), rank[codes.ravel()]
+
+    @staticmethod
+    def exact_totals(codes, salary):
+        """
+        Точно (без ошибок округления) суммирует зарплаты по кодам: каждое число раскладывается на целую
+        53-битную мантиссу и показатель степени двойки, мантиссы делятся на три 18-битные части и суммируются
+        по парам (код, показатель) через bincount - такие суммы точны в float64 для любого реалистичного
+        количества строк, - а затем собираются в целые числа Python
+        Args:
+            codes: массив кодов ключей
+            salary: массив зарплат
+
+        Returns:
+            dict: код -> (числитель, степень двойки в знаменателе) точной суммы, как в SalaryStat
+        """
+        import numpy as np
+        mantissas, exponents = np.frexp(salary)
+        mantissas = np.ldexp(mantissas, 53).astype(np.int64)
+        exponents = exponents.astype(np.int64) - 53
+        lowest = int(exponents.min())
+        span = int(exponents.max()) - lowest + 1
+        pairs, inverse = np.unique(codes.astype(np.int64) * span + (exponents - lowest), return_inverse=True)
+        signs, magnitudes = np.sign(mantissas), np.abs(mantissas)
+        parts = [np.bincount(inverse.ravel(), weights=signs * ((magnitudes >> shift) & 0x3FFFF),
+                             minlength=len(pairs)).tolist() for shift in (0, 18, 36)]
+        terms = {}
+        for pair, low, middle, high in zip(pairs.tolist(), *parts):
+            code, exponent = divmod(pair, span)
+            value = int(low) + (int(middle) << 18) + (int(high) << 36)
+            terms.setdefault(code, []).append((value, exponent + lowest))
+        totals = {}
+        for code, values in terms.items():
+            scale = max(0, -min(exponent for _, exponent in values))
+            totals[code] = (sum(value << (exponent + scale) for value, exponent in values), scale)
+        return totals
+
+    @staticmethod
+    def group(keys, codes, salary, salary_dict, count_dict):
+        """
+        Группирует зарплаты по кодам и заполняет объекты SalaryDict и CountDict итогами по каждому ключу
+        (суммы зарплат считаются точно, exact_totals, поэтому средние совпадают с последовательной обработкой)
+        Args:
+            keys: значения ключей, соответствующие кодам
+            codes: массив кодов ключей
+            salary: массив зарплат
+            salary_dict (SalaryDict): объект для итогов по зарплатам
+            count_dict (CountDict): объект для количества
+        """
+        import numpy as np
+        if len(codes) == 0:
+            return
+        present = np.unique(codes, return_index=True)[1]
+        order = codes[np.sort(present)]
+        length = len(keys)
+        counts = np.bincount(codes, minlength=length)
+        totals = np.bincount(codes, weights=salary, minlength=length)
+        means = totals / np.maximum(counts, 1)
+        m2 = np.bincount(codes, weights=(salary - means[codes]) ** 2, minlength=length)
+        minimum = np.full(length, np.inf)
+        maximum = np.full(length, -np.inf)
+        np.minimum.at(minimum, codes, salary)
+        np.maximum.at(maximum, codes, salary)
+        exact_totals = ColumnarData.exact_totals(codes, salary)
+        for code in order.tolist():
+            key = keys[code]
+            count = int(counts[code])
+            salary_dict.salary_dict[key] = SalaryStat.from_totals(
+                count, *exact_totals[code], float(minimum[code]), float(maximum[code]), float(m2[code]))
+            count_dict.count_dict[key] = count
+            count_dict.length += count
+        if SalaryStat.sketches:
+            positive = salary > 0
+            buckets = np.floor(np.log(salary[positive]) / SalarySketch.log_gamma).astype(np.int64)
+            pairs, pair_counts = np.unique(np.stack([codes[positive].astype(np.int64), buckets]), axis=1,
+                                           return_counts=True)
+            for code, index, count in zip(pairs[0].tolist(), pairs[1].tolist(), pair_counts.tolist()):
+                salary_dict.salary_dict[keys[code]].sketch.buckets[index] = count
+            zero_counts = np.bincount(codes[~positive], minlength=length)
+            for code in np.flatnonzero(zero_counts).tolist():
+                salary_dict.salary_dict[keys[code]].sketch.zero_count = int(zero_counts[code])
+
+    def inspection_vacancy(self, prof, data):
+        """
+        Векторно вносит информацию о вакансиях и переданной профессии в атрибуты объекта ParseData
+        Args:
+            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+            data (ParseData): объект, который нужно заполнить
+        """
+        import numpy as np
+        self.group(self.year_keys, self.years, self.salary, data.salary_lvl_by_year, data.count_vac_by_year)
+        self.group(self.area_keys, self.areas, self.salary, data.salary_lvl_by_city, data.vacancy_rate_by_city)
+        mask = np.array([prof in name for name in self.name_keys], dtype=bool)[self.name_codes]
+        self.group(self.year_keys, self.years[mask], self.salary[mask],
+                   data.salary_lvl_by_year_for_prof, data.count_vac_by_year_for_prof)
+
+
+class ProfessionMatcher:
+    """
+    Поиск нескольких профессий в названии вакансии за один проход по строке (алгоритм Ахо-Корасик)
+    Attributes:
+        professions: список искомых профессий
+        goto: переходы автомата (для каждого состояния - словарь символ -> состояние)
+        fail: суффиксные ссылки автомата
+        out: номера профессий, найденных при попадании в состояние
+        cache: найденные профессии для уже встречавшихся названий вакансий
+        cache_size: максимальный размер cache
+    """
+    def __init__(self, professions, cache_size=100_000):
+        """
+        Инициализирует объект ProfessionMatcher и строит автомат по списку профессий
+        Args:
+            professions (list): список профессий
+            cache_size (int): максимальное количество запоминаемых названий вакансий
+        """
+        self.professions = list(professions)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for index, prof in enumerate(self.professions):
+            state = 0
+            for char in prof:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = next_state
+            self.out[state] += (index,)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                self.out[next_state] += self.out[self.fail[next_state]]
+
+        self.cache = {}
+        self.cache_size = cache_size
+
+    def find(self, text):
+        """
+        Возвращает номера профессий, входящих в text как подстрока
+        Args:
+            text (str): название вакансии
+
+        Returns:
+            frozenset: номера найденных профессий
+        """
+        found = self.cache.get(text)
+        if found is not None:
+            return found
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        found = frozenset(found)
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[text] = found
+        return found
+
+
+class ProfessionsBatch:
+    """
+    Статистика сразу для нескольких профессий за один проход по данным
+    Attributes:
+        professions: список профессий (без повторов)
+        matcher: объект ProfessionMatcher для поиска профессий в названиях вакансий
+        data: объект ParseData с общей статистикой по всем вакансиям
+        salary_by_prof: объекты SalaryDict с зарплатами по годам для каждой профессии
+        count_by_prof: объекты CountDict с количеством вакансий по годам для каждой профессии
+    """
+    def __init__(self, professions, vacancy_filter=None):
+        """
+        Инициализирует объект ProfessionsBatch
+        Args:
+            professions: список профессий
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+        """
+        self.professions = list(dict.fromkeys(professions))
+        self.matcher = ProfessionMatcher(self.professions)
+        self.data = ParseData(vacancy_filter)
+        self.salary_by_prof = [SalaryDict() for _ in self.professions]
+        self.count_by_prof = [CountDict() for _ in self.professions]
+
+    def inspection_vacancy(self, vacancies):
+        """
+        Вносит информацию о вакансиях в общую статистику и в статистику каждой найденной в названии профессии
+        Args:
+            vacancies: итерируемый объект объектов типа VacancyRecord
+        """
+        data = self.data
+        find = self.matcher.find
+        rates = ParseData.currency_rates
+        if data.vacancy_filter is not None:
+            vacancies = data.vacancy_filter.apply(vacancies)
+        for vacancy in vacancies:
+            vacancy_salary = (vacancy.salary_from + vacancy.salary_to) / 2 * rates[vacancy.salary_currency, vacancy.month]
+            data.salary_lvl_by_year.add_salary(vacancy.published_at, vacancy_salary)
+            data.count_vac_by_year.add(vacancy.published_at)
+            data.salary_lvl_by_city.add_salary(vacancy.area_name, vacancy_salary)
+            data.vacancy_rate_by_city.add(vacancy.area_name)
+            for index in find(vacancy.name):
+                self.salary_by_prof[index].add_salary(vacancy.published_at, vacancy_salary)
+                self.count_by_prof[index].add(vacancy.published_at)
+
+    def get_results(self):
+        """
+        Возвращает для каждой профессии те же шесть словарей, что и ParseData.get_data
+
+        Returns:
+            dict: профессия -> кортеж из шести словарей со статистикой
+        """
+        common = self.data.get_results()
+        results = {}
+        for prof, salary_dict, count_dict in zip(self.professions, self.salary_by_prof, self.count_by_prof):
+            part = ParseData(self.data.vacancy_filter)
+            part.salary_lvl_by_year = self.data.salary_lvl_by_year
+            part.count_vac_by_year = self.data.count_vac_by_year
+            part.salary_lvl_by_year_for_prof = salary_dict
+            part.count_vac_by_year_for_prof = count_dict
+            part.checked_salary()
+            results[prof] = (common[0], common[1], salary_dict.get_aver_salary(), count_dict.count_dict,
+                             common[4], common[5])
+        return results
+
+
+class VacancyAggregates:
+    """
+    Промежуточная (ещё не сведённая в итоговые словари) статистика по файлу вакансий, из которой можно получить
+    результат ParseData.get_data для любой профессии без повторного чтения файла
+    Attributes:
+        data: объект ParseData с общей статистикой по годам и городам
+        by_name: название вакансии -> (SalaryDict с зарплатами по годам, словарь год -> номер первой строки с этим годом)
+        rows_count: количество учтённых вакансий
+    """
+    def __init__(self):
+        """Инициализирует пустой объект VacancyAggregates"""
+        self.data = ParseData()
+        self.by_name = {}
+        self.rows_count = 0
+
+    def inspection_vacancy(self, vacancies):
+        """
+        Вносит информацию о вакансиях в общую статистику и в статистику по названиям вакансий
+        Args:
+            vacancies: итерируемый объект объектов типа VacancyRecord
+        """
+        data = self.data
+        row_number = self.rows_count
+        rates = ParseData.currency_rates
+        for vacancy in vacancies:
+            vacancy_salary = (vacancy.salary_from + vacancy.salary_to) / 2 * rates[vacancy.salary_currency, vacancy.month]
+            data.salary_lvl_by_year.add_salary(vacancy.published_at, vacancy_salary)
+            data.count_vac_by_year.add(vacancy.published_at)
+            data.salary_lvl_by_city.add_salary(vacancy.area_name, vacancy_salary)
+            data.vacancy_rate_by_city.add(vacancy.area_name)
+            by_name = self.by_name.get(vacancy.name)
+            if by_name is None:
+                by_name = self.by_name[vacancy.name] = (SalaryDict(), {})
+            by_name[0].add_salary(vacancy.published_at, vacancy_salary)
+            by_name[1].setdefault(vacancy.published_at, row_number)
+            row_number += 1
+        self.rows_count = row_number
+
+    def get_data(self, prof):
+        """
+        Возвращает те же шесть словарей, что и ParseData.get_data, для заданной профессии
+        Args:
+            prof: профессия, для которой собираются count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+
+        Returns:
+            кортеж из шести словарей со статистикой
+        """
+        return self.get_parse_data(prof).get_results()
+
+    def get_parse_data(self, prof):
+        """
+        Возвращает объект ParseData с общей статистикой и статистикой по заданной профессии
+        (ещё не сведённой в итоговые словари методом get_results)
+        Args:
+            prof: профессия, для которой собираются count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
+
+        Returns:
+            ParseData
+        """
+        data = copy.deepcopy(self.data)
+        self.fill_profession(data, prof)
+        return data
+
+    def fill_profession(self, data, prof, names=None):
+        """
+        Заполняет статистику по профессии (salary_lvl_by_year_for_prof и count_vac_by_year_for_prof) объекта data
+        Args:
+            data (ParseData): объект с пустой статистикой по профессии
+            prof: профессия
+            names: названия вакансий, среди которых ищется профессия (по умолчанию - все названия в порядке by_name;
+            если заданы, должны идти в том же порядке)
+        """
+        first_rows = {}
+        matched = []
+        for name in self.by_name if names is None else names:
+            salary_dict, name_first_rows = self.by_name[name]
+            if prof in name:
+                matched.append(salary_dict)
+                for year, row_number in name_first_rows.items():
+                    if row_number < first_rows.get(year, row_number + 1):
+                        first_rows[year] = row_number
+
+        salary_for_prof = data.salary_lvl_by_year_for_prof
+        count_for_prof = data.count_vac_by_year_for_prof
+        for year in sorted(first_rows, key=first_rows.get):
+            salary_for_prof.salary_dict[year] = SalaryStat()
+        for salary_dict in matched:
+            salary_for_prof.merge(salary_dict)
+        for year, stat in salary_for_prof.salary_dict.items():
+            count_for_prof.count_dict[year] = stat.count
+            count_for_prof.length += stat.count
+
+    @classmethod
+    def from_file(cls, file_name):
+        """
+        Считает статистику по csv-файлу за один проход
+        Args:
+            file_name (str): имя csv-файла
+
+        Returns:
+            VacancyAggregates
+        """
+        dataset = DataSet(file_name, streaming=True)
+        aggregates = cls()
+        aggregates.inspection_vacancy(VacancyRecord.from_rows(dataset.columns_names, dataset.vacancies_data))
+        return aggregates
+
+
+class NameIndex:
+    """
+    Инвертированный индекс названий вакансий по триграммам (тройкам подряд идущих символов): профессия входит
+    в название как подстрока только если в названии есть все триграммы профессии, поэтому проверять
+    подстроку нужно лишь у названий из пересечения списков этих триграмм
+    Attributes:
+        names: названия вакансий (номер в списке - номер названия)
+        postings: триграмма -> возрастающий список номеров названий, в которых она встречается
+    """
+    def __init__(self, names):
+        """
+        Инициализирует объект NameIndex и строит индекс
+        Args:
+            names: названия вакансий
         """
-        self.inspection_vacancy(prof, vacancies)
-        self.checked_salary()
-        self.salary_lvl_by_city, list_del_town = self.get_top_aver_salary(self.salary_lvl_by_city)
-        self.vacancy_rate_by_city.get_proportion()
-        self.vacancy_rate_by_city = self.get_top_rate_by_city(self.vacancy_rate_by_city)
-        self.vacancy_rate_by_city = dict((x, y) for x, y in self.vacancy_rate_by_city)
-        return self.salary_lvl_by_year.get_aver_salary(), self.count_vac_by_year.count_dict, \
-               self.salary_lvl_by_year_for_prof.get_aver_salary(), self.count_vac_by_year_for_prof.count_dict, \
-               self.salary_lvl_by_city, self.vacancy_rate_by_city
-
-    def checked_salary(self):
-        """Проверяет, совпадает ли количество данных по вакансиям и зарплатам
-         в атрибутах текущего объекта и, если нет, добавляет недостающие"""
-        if self.salary_lvl_by_year_for_prof.salary_dict == {}:
-            self.salary_lvl_by_year_for_prof.salary_dict = {x: [0] for x in self.salary_lvl_by_year.salary_dict.keys()}
-        elif self.salary_lvl_by_year_for_prof.salary_dict != {} and len(
-                list(self.salary_lvl_by_year.get_aver_salary().keys())) != len(
-            list(self.salary_lvl_by_year_for_prof.get_aver_salary().keys())):
-            for key in list(self.salary_lvl_by_year.get_aver_salary().keys()):
-                if key not in list(self.salary_lvl_by_year_for_prof.get_aver_salary().keys()):
-                    self.salary_lvl_by_year_for_prof.get_aver_salary()[key] = 0
-        if self.count_vac_by_year_for_prof.count_dict == {}:
-            self.count_vac_by_year_for_prof.count_dict = {x: 0 for x in self.count_vac_by_year.count_dict.keys()}
-        elif self.count_vac_by_year_for_prof.count_dict != {} and len(
-                list(self.count_vac_by_year.count_dict.keys())) != len(
-            list(self.count_vac_by_year_for_prof.count_dict.keys())):
-            for key in list(self.count_vac_by_year.count_dict.keys()):
-                if key not in list(self.count_vac_by_year_for_prof.count_dict.keys()):
-                    self.count_vac_by_year_for_prof.count_dict[key] = 0
+        self.names = list(names)
+        self.postings = {}
+        for number, name in enumerate(self.names):
+            for trigram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                self.postings.setdefault(trigram, array('I')).append(number)
 
-    def inspection_vacancy(self, prof, vacancies):
+    def find(self, prof):
         """
-        Вносит информацию о вакансиях и переданной профессии в атрибуты текущего объекта
+        Возвращает названия вакансий, которые могут содержать профессию (для профессий короче трёх символов -
+        все названия), в порядке списка names
         Args:
-            prof: профессия, для которой мы обновляем count_vac_by_year_for_prof и salary_lvl_by_year_for_prof
-            vacancies: список объектов типа Vacancy, содержащий данные о вакансиях
+            prof (str): профессия
 
         Returns:
+            list: названия-кандидаты
+        """
+        if len(prof) < 3:
+            return self.names
+        postings = []
+        for trigram in {prof[i:i + 3] for i in range(len(prof) - 2)}:
+            numbers = self.postings.get(trigram)
+            if numbers is None:
+                return []
+            postings.append(numbers)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for numbers in postings[1:]:
+            candidates.intersection_update(numbers)
+            if not candidates:
+                return []
+        return [self.names[number] for number in sorted(candidates)]
+
+
+class QueryService:
+    """
+    Резидентная статистика для быстрых ответов на запросы по профессиям: вакансии один раз сводятся
+    в VacancyAggregates, общая часть ответа (по всем вакансиям) считается заранее, названия вакансий
+    индексируются NameIndex, а последние ответы хранятся в LRU-кэше
+    Attributes:
+        aggregates: объект VacancyAggregates
+        index: объект NameIndex по названиям вакансий
+        common: общие для всех профессий словари (уровень зарплат и количество вакансий по годам,
+        рейтинги городов)
+        cache: профессия -> ответ (в порядке последнего использования)
+        cache_size: максимальный размер cache
+        lock: блокировка для кэша при одновременных запросах
+    """
+    result_names = ('salary_lvl_by_year', 'count_vac_by_year', 'salary_lvl_by_year_for_prof',
+                    'count_vac_by_year_for_prof', 'salary_lvl_by_city', 'vacancy_rate_by_city')
 
+    def __init__(self, aggregates, cache_size=1024):
         """
-        for vacancy in vacancies:
-            vacancy_salary = (vacancy.salary_from + vacancy.salary_to) / 2 * ParseData.currency_to_rub[vacancy.salary_currency]
-            self.salary_lvl_by_year.add_salary(vacancy.published_at, vacancy_salary)
-            self.count_vac_by_year.add(vacancy.published_at)
-            self.salary_lvl_by_city.add_salary(vacancy.area_name, vacancy_salary)
-            self.vacancy_rate_by_city.add(vacancy.area_name)
-            if prof in vacancy.name:
-                self.salary_lvl_by_year_for_prof.add_salary(vacancy.published_at, vacancy_salary)
-                self.count_vac_by_year_for_prof.add(vacancy.published_at)
+        Инициализирует объект QueryService
+        Args:
+            aggregates (VacancyAggregates): статистика по файлу вакансий
+            cache_size (int): максимальное количество запоминаемых ответов
+        """
+        self.aggregates = aggregates
+        self.index = NameIndex(aggregates.by_name)
+        self.common = copy.deepcopy(aggregates.data).get_results()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def get_data(self, prof):
+        """
+        Возвращает те же шесть словарей, что и ParseData.get_data, для заданной профессии
+        Args:
+            prof (str): профессия
+
+        Returns:
+            кортеж из шести словарей со статистикой
+        """
+        with self.lock:
+            result = self.cache.get(prof)
+            if result is not None:
+                self.cache.move_to_end(prof)
+                return result
+        data = ParseData()
+        data.salary_lvl_by_year = self.aggregates.data.salary_lvl_by_year
+        data.count_vac_by_year = self.aggregates.data.count_vac_by_year
+        self.aggregates.fill_profession(data, prof, self.index.find(prof))
+        data.checked_salary()
+        result = (self.common[0], self.common[1], data.salary_lvl_by_year_for_prof.get_aver_salary(),
+                  data.count_vac_by_year_for_prof.count_dict, self.common[4], self.common[5])
+        with self.lock:
+            self.cache[prof] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def serve(self, host='127.0.0.1', port=8000):
+        """
+        Запускает HTTP-сервер, отвечающий на запросы GET /profession?name=<профессия> объектом JSON
+        с шестью словарями статистики. Каждый запрос обрабатывается в отдельном потоке
+        Args:
+            host (str): адрес сервера
+            port (int): порт сервера
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlsplit
+        service = self
+
+        class QueryHandler(BaseHTTPRequestHandler):
+            """Обработчик запросов к QueryService"""
+            def do_GET(self):
+                """Отвечает на запрос GET"""
+                url = urlsplit(self.path)
+                names = parse_qs(url.query).get('name')
+                if url.path != '/profession':
+                    self.send_answer(404, {'error': 'Неизвестный адрес'})
+                elif not names or not names[0]:
+                    self.send_answer(400, {'error': 'Не указана профессия'})
+                else:
+                    result = service.get_data(names[0])
+                    self.send_answer(200, dict(zip(service.result_names, result)))
+
+            def send_answer(self, status, answer):
+                """Отправляет ответ в формате JSON"""
+                body = json.dumps(answer, ensure_ascii=False).encode('utf_8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                """Не выводит журнал запросов"""
+
+        class QueryServer(ThreadingHTTPServer):
+            """HTTP-сервер с очередью подключений, рассчитанной на много одновременных запросов"""
+            request_queue_size = 128
+
+        with QueryServer((host, port), QueryHandler) as server:
+            print(f'Сервер запущен: http://{host}:{server.server_address[1]}/profession?name=<профессия>',
+                  file=sys.stderr)
+            server.serve_forever()
+
+
+class AggregateCache:
+    """
+    Дисковый кэш объектов VacancyAggregates. Запись ищется по пути, размеру и времени изменения файла,
+    а если они не совпали - по хэшу содержимого, так что переименованный или скопированный файл тоже
+    не читается повторно. Общий размер кэша ограничен: при превышении удаляются давно не использованные записи
+    Attributes:
+        directory: папка кэша
+        max_size: максимальный общий размер записей в байтах
+        index_path: путь к индексу (путь к файлу -> размер, время изменения и хэш содержимого)
+    """
+    def __init__(self, directory='.vacancy_cache', max_size=1024 ** 3):
+        """
+        Инициализирует объект AggregateCache
+        Args:
+            directory (str): папка кэша
+            max_size (int): максимальный общий размер записей в байтах
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.index_path = os.path.join(directory, 'index.json')
 
     @staticmethod
-    def get_top_aver_salary(list_all_salary):
+    def file_digest(file_name):
         """
-        Возвращает топ-10 городов с самым высоким значением средней зарплаты по городу и список городов,
+        Считает хэш содержимого файла
         Args:
-            list_all_salary: данные о зарплатах для каждого города
+            file_name (str): имя файла
+
+        Returns:
+            str: шестнадцатеричная запись хэша
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        with open(file_name, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def read_index(self):
+        """Возвращает содержимое индекса кэша"""
+        try:
+            with open(self.index_path, encoding='utf_8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def write_index(self, index):
+        """Сохраняет индекс кэша"""
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf_8') as file:
+            json.dump(index, file, ensure_ascii=False)
+        os.replace(temp_path, self.index_path)
+
+    def entry_path(self, digest):
         """
-        dic_average = []
-        dic_town_count = {}
-        for i in range(len(list_all_salary.salary_dict)):
-            town = list(list_all_salary.salary_dict)[i]
-            s = list(list_all_salary.salary_dict.values())[i]
-            dic_town_count[town] = len(s)
-            aver = int(sum(s) / len(s))
-            dic_average.append((town, aver))
+        Возвращает путь к записи кэша с заданным хэшем содержимого (статистика зависит от курсов валют
+        и от того, собираются ли гистограммы зарплат, поэтому к имени записи добавляется хэш таблицы курсов
+        по месяцам и отметка sketches)
+        """
+        parts = [digest, ParseData.currency_rates.digest, 'sketches' if SalaryStat.sketches else '']
+        return os.path.join(self.directory, '.'.join(part for part in parts if part) + '.pickle')
 
-        s = sum(dic_town_count.values())
-        list_del_town = []
-        list_del_town_index = []
-        for i in range(len(dic_town_count.items())):
-            n = list(dic_town_count.values())[i]
-            town = list(dic_town_count)[i]
-            percent = round(100 * int(n) / s, 1)
-            if percent < 1 or town == 'Россия':
-                list_del_town.append((town, n))
-                list_del_town_index.append(i)
+    def lookup(self, file_name):
+        """
+        Определяет хэш содержимого файла, по возможности не читая файл
+        Args:
+            file_name (str): имя файла
 
-        for i in reversed(range(len(list_del_town))):
-            del dic_town_count[list_del_town[i][0]]
-            del dic_average[list_del_town_index[i]]
+        Returns:
+            digest: хэш содержимого
+            index: индекс кэша, в котором для файла уже записаны актуальные размер, время изменения и хэш
+        """
+        path = os.path.abspath(file_name)
+        stat = os.stat(path)
+        index = self.read_index()
+        entry = index.get(path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['digest'], index
+        digest = self.file_digest(path)
+        index[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest}
+        return digest, index
+
+    def load(self, file_name):
+        """
+        Возвращает статистику по файлу: из кэша, если файл не менялся, или посчитанную заново (и сохраняет её в кэш)
+        Args:
+            file_name (str): имя csv-файла
 
-        top_aver_salary = dict(sorted(dic_average, key=lambda row: row[1], reverse=True))
-        big_salary_dict = {}
-        for key, value in top_aver_salary.items():
-            big_salary_dict[key] = value
-        return {x: big_salary_dict[x] for x in list(big_salary_dict)[:10]}, list_del_town
+        Returns:
+            VacancyAggregates
+        """
+        digest, index = self.lookup(file_name)
+        entry_path = self.entry_path(digest)
+        try:
+            with open(entry_path, 'rb') as file:
+                aggregates = pickle.load(file)
+            os.utime(entry_path)
+            self.write_index(index)
+            return aggregates
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+        aggregates = VacancyAggregates.from_file(file_name)
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = entry_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(aggregates, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, entry_path)
+        self.write_index(index)
+        self.evict()
+        return aggregates
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока общий размер кэша больше max_size"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        removed = set()
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            os.remove(os.path.join(self.directory, name))
+            removed.add(name.split('.')[0])
+            total -= size
+        if removed:
+            index = self.read_index()
+            self.write_index({path: entry for path, entry in index.items() if entry['digest'] not in removed})
+
+    def invalidate(self, file_name=None):
+        """
+        Удаляет из кэша запись для заданного файла или, если файл не указан, очищает весь кэш
+        Args:
+            file_name (str): имя csv-файла
+        """
+        index = self.read_index()
+        if file_name is None:
+            digests = {entry['digest'] for entry in index.values()}
+            index = {}
+        else:
+            entry = index.pop(os.path.abspath(file_name), None)
+            digests = {entry['digest']} if entry is not None else set()
+            if os.path.isfile(file_name):
+                digests.add(self.file_digest(file_name))
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.pickle') and (file_name is None or name.split('.')[0] in digests):
+                    os.remove(os.path.join(self.directory, name))
+        if os.path.isdir(self.directory):
+            self.write_index({path: entry for path, entry in index.items() if entry['digest'] not in digests})
+
+
+class IncrementalStatistics:
+    """
+    Сохраняемая между запусками статистика по дополняемому файлу вакансий: при обновлении читаются только
+    строки, дописанные после последнего учтённого байта, или отдельный csv-файл с новыми вакансиями
+    Attributes:
+        state_path: путь к файлу состояния
+        file_name: имя отслеживаемого csv-файла
+        offset: номер байта, до которого файл уже учтён
+        columns_names: названия столбцов отслеживаемого файла
+        head_digest: хэш начала файла (по нему определяется, что файл был заменён, а не дописан)
+        rates_digest: хэш таблицы курсов валют, с которой посчитана статистика
+        sketches: собраны ли в статистике гистограммы зарплат
+        applied_deltas: хэши содержимого уже учтённых файлов с новыми вакансиями (add_delta)
+        aggregates: объект VacancyAggregates с накопленной статистикой
+    """
+    head_size = 64 * 1024
 
-    @staticmethod
-    def get_top_rate_by_city(vacancy_rate_by_city):
+    def __init__(self, state_path):
         """
-        Возвращает топ-10 городов с самым большим количеством вакансий
+        Инициализирует объект IncrementalStatistics, загружая сохранённое состояние, если оно есть
         Args:
-            vacancy_rate_by_city: объект CountDict с данными о количестве вакансий для каждого города
+            state_path (str): путь к файлу состояния
         """
-        s = vacancy_rate_by_city.length
-        list_del_town = []
-        for i in reversed(range(len(list_del_town))):
-            del vacancy_rate_by_city.count_dict[list_del_town[i][0]]
-        for i in range(len(vacancy_rate_by_city.count_dict.keys())):
-            if 'Россия' in vacancy_rate_by_city.count_dict.keys():
-                del vacancy_rate_by_city.count_dict['Россия']
+        self.state_path = state_path
+        self.file_name = None
+        self.offset = 0
+        self.columns_names = None
+        self.head_digest = None
+        self.rates_digest = ''
+        self.sketches = False
+        self.applied_deltas = set()
+        self.aggregates = VacancyAggregates()
+        if os.path.exists(state_path):
+            with open(state_path, 'rb') as file:
+                self.__dict__.update(pickle.load(file))
+
+    def save(self):
+        """Сохраняет состояние в файл state_path"""
+        state = {key: value for key, value in self.__dict__.items() if key != 'state_path'}
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.state_path)
+
+    def get_head_digest(self, file_name, offset):
+        """Возвращает хэш первых байтов файла (не дальше offset)"""
+        with open(file_name, 'rb') as file:
+            return hashlib.blake2b(file.read(min(offset, self.head_size)), digest_size=20).hexdigest()
+
+    def update(self, file_name):
+        """
+        Учитывает строки, дописанные в файл после прошлого обновления. Если отслеживается другой файл,
+        файл был изменён не дописыванием, изменились курсы валют или сбор гистограмм зарплат, статистика
+        пересчитывается по всему файлу. Вакансии из уже учтённых файлов --delta при этом были бы потеряны,
+        поэтому в таком случае работа завершается с сообщением
+        Args:
+            file_name (str): имя csv-файла
 
-        proportion_dict = {}
-        for key, value in vacancy_rate_by_city.count_dict.items():
-            proportion = value / s
-            if proportion >= 0.01:
-                proportion_dict[key] = round(proportion, 4)
+        Returns:
+            int: количество учтённых новых вакансий
+        """
+        file_name = os.path.abspath(file_name)
+        end = DataSet.complete_lines_end(file_name)
+        if (self.file_name != file_name or end < self.offset or self.rates_digest != ParseData.currency_rates.digest
+                or self.sketches != SalaryStat.sketches
+                or self.get_head_digest(file_name, self.offset) != self.head_digest):
+            if self.applied_deltas:
+                print(f'Статистику в {self.state_path} нужно пересчитать по файлу {file_name} заново, '
+                      f'но в неё входят вакансии из файлов --delta ({len(self.applied_deltas)}), которые при этом '
+                      f'будут потеряны: удалите файл состояния и повторите обновление с нужными --delta')
+                sys.exit(1)
+            self.file_name = file_name
+            self.rates_digest = ParseData.currency_rates.digest
+            self.sketches = SalaryStat.sketches
+            self.columns_names, self.offset = DataSet.read_header(file_name)
+            if self.columns_names is None:
+                print('Пустой файл')
+                sys.exit(1)
+            self.applied_deltas = set()
+            self.aggregates = VacancyAggregates()
+        rows_count = self.aggregates.rows_count
+        if end > self.offset:
+            rows = DataSet.read_chunk(file_name, self.offset, end, self.columns_names)
+            self.aggregates.inspection_vacancy(VacancyRecord.from_rows(self.columns_names, rows))
+            self.offset = end
+        self.head_digest = self.get_head_digest(file_name, self.offset)
+        return self.aggregates.rows_count - rows_count
+
+    def add_delta(self, delta_file):
+        """
+        Учитывает вакансии из отдельного csv-файла с новыми строками (со своей строкой заголовка).
+        Файл с тем же содержимым учитывается только один раз: повторный вызов его пропускает
+        Args:
+            delta_file (str): имя csv-файла с новыми вакансиями
+
+        Returns:
+            int: количество учтённых новых вакансий
+        """
+        digest = AggregateCache.file_digest(delta_file)
+        if digest in self.applied_deltas:
+            print(f'Файл {delta_file} уже учтён в статистике, пропущен', file=sys.stderr)
+            return 0
+        rows = DataSet.read_csv(delta_file)
+        columns_names = next(rows, None)
+        self.applied_deltas.add(digest)
+        if columns_names is None:
+            return 0
+        rows_count = self.aggregates.rows_count
+        self.aggregates.inspection_vacancy(
+            VacancyRecord.from_rows(columns_names, DataSet.filter_rows(rows, columns_names)))
+        return self.aggregates.rows_count - rows_count
+
+    def get_data(self, prof):
+        """
+        Возвращает шесть словарей со статистикой (как ParseData.get_data) по всем учтённым вакансиям
+        Args:
+            prof: профессия
 
-        sorted_dict = sorted(proportion_dict.items(), key=lambda row: row[1], reverse=True)
-        return sorted_dict[:10]
+        Returns:
+            кортеж из шести словарей со статистикой
+        """
+        return self.aggregates.get_data(prof)
 
 
 class Report:
@@ -394,15 +2600,37 @@ class Report:
         ax2: область для графика, отображающего количество вакансий по годам
         ax3: область для графика, отображающего уровень зарплат по городам
         ax4: область для графика, отображающего количество вакансий по городам
+        percentile_names: заголовки столбцов с процентилями зарплат (в порядке ParseData.percentiles)
     """
-    def __init__(self):
-        """Инициализирует объект класса Report"""
-        self.wb = Workbook()
-        self.sheet1 = self.wb.active
-        self.sheet1.title = 'Статистика по годам'
-        self.sheet2 = self.wb.create_sheet('Статистика по городам')
+    percentile_names = ('10-й процентиль зарплат', 'Медианная зарплата', '90-й процентиль зарплат')
 
-        self.fig = plt.figure()
+    def __init__(self, excel=True, image=True, headless=False):
+        """
+        Инициализирует объект класса Report. Библиотеки openpyxl и matplotlib импортируются только для тех
+        частей отчёта, которые нужны
+        Args:
+            excel (bool): готовить ли xlsx-документ
+            image (bool): готовить ли графики
+            headless (bool): рисовать графики напрямую через Agg, не создавая окон и не регистрируя фигуру в pyplot
+        """
+        self.headless = headless
+        if excel:
+            from openpyxl import Workbook
+            self.wb = Workbook()
+            self.sheet1 = self.wb.active
+            self.sheet1.title = 'Статистика по годам'
+            self.sheet2 = self.wb.create_sheet('Статистика по городам')
+
+        if not image:
+            return
+        if headless:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            self.fig = Figure()
+            FigureCanvasAgg(self.fig)
+        else:
+            import matplotlib.pyplot as plt
+            self.fig = plt.figure()
         self.ax1 = self.fig.add_subplot(221)
         self.ax1.set_title('Уровень зарплат по годам')
         self.ax2 = self.fig.add_subplot(222)
@@ -412,13 +2640,19 @@ class Report:
         self.ax4 = self.fig.add_subplot(224)
         self.ax4.set_title('Доля вакансий по городам')
 
-    def generate_excel(self, data, prof):
+    def generate_excel(self, data, prof, file_name='report.xlsx', distribution=None):
         """
         Заполняет данными листы sheet1 и sheet2
         Args:
             data: данные
             prof: название профессии
+            file_name (str): имя сохраняемого xlsx-файла
+            distribution (dict): процентили зарплат (ParseData.distribution) - если заданы, на листы добавляются
+            столбцы с процентилями по годам и по городам
         """
+        from openpyxl.styles import Font, Side
+        from openpyxl.styles.numbers import FORMAT_PERCENTAGE_00
+        from openpyxl.utils import get_column_letter
         salary_lvl_by_year = data[0]
         count_vac_by_year = data[1]
         salary_lvl_by_year_for_prof = data[2]
@@ -429,36 +2663,156 @@ class Report:
         names_sheet1 = ['Год', 'Средняя зарплата', f'Средняя зарплата - {prof}',
                         'Количество вакансий', f'Количество вакансий - {prof}']
         names_sheet2 = ['Город', 'Уровень зарплат', 'Город', 'Доля вакансий']
+        separator = 3
+        if distribution is not None:
+            names_sheet1 += list(self.percentile_names) + [f'{name} - {prof}' for name in self.percentile_names]
+            names_sheet2[2:2] = self.percentile_names
+            separator += len(self.percentile_names)
 
         for i, name in enumerate(names_sheet1):
             self.sheet1.cell(row=1, column=(i + 1), value=name).font = Font(bold=True)
         for year, value in salary_lvl_by_year.items():
-            self.sheet1.append([year, value, salary_lvl_by_year_for_prof[year], count_vac_by_year[year],
-                                count_vac_by_year_for_prof[year]])
+            row = [year, value, salary_lvl_by_year_for_prof[year], count_vac_by_year[year],
+                   count_vac_by_year_for_prof[year]]
+            if distribution is not None:
+                row += list(distribution['by_year'][year])
+                row += list(distribution['by_year_for_prof'].get(year, (0,) * len(self.percentile_names)))
+            self.sheet1.append(row)
 
         for i, name in enumerate(names_sheet2):
             self.sheet2.cell(row=1, column=(i + 1), value=name).font = Font(bold=True)
         for i in range(len(list(salary_lvl_by_city.keys()))):
-            self.sheet2.append([list(salary_lvl_by_city.keys())[i], list(salary_lvl_by_city.values())[i],
-                                list(vacancy_rate_by_city.keys())[i], list(vacancy_rate_by_city.values())[i]])
+            town = list(salary_lvl_by_city.keys())[i]
+            percentiles = list(distribution['by_city'][town]) if distribution is not None else []
+            self.sheet2.append([town, list(salary_lvl_by_city.values())[i]] + percentiles +
+                               [list(vacancy_rate_by_city.keys())[i], list(vacancy_rate_by_city.values())[i]])
 
         side = Side(border_style='thin', color='000000')
         self.set_border(self.sheet1, side)
         self.set_border(self.sheet2, side)
-        self.sheet2.insert_cols(3)
-        self.sheet2.column_dimensions['C'].width = 2
+        self.sheet2.insert_cols(separator)
+        self.sheet2.column_dimensions[get_column_letter(separator)].width = 2
 
         self.column_width(self.sheet1)
         self.column_width(self.sheet2)
 
-        for i in range(2, len(self.sheet2['E']) + 1):
-            self.sheet2[f'E{i}'].number_format = FORMAT_PERCENTAGE_00
+        rate_column = get_column_letter(separator + 2)
+        for i in range(2, len(self.sheet2[rate_column]) + 1):
+            self.sheet2[f'{rate_column}{i}'].number_format = FORMAT_PERCENTAGE_00
+
+        self.wb.save(file_name)
+
+    @staticmethod
+    def generate_excel_streaming(data, prof, file_name='report.xlsx', distribution=None):
+        """
+        Сохраняет тот же xlsx-документ, что и generate_excel, в потоковом режиме openpyxl (write-only):
+        строки сразу записываются в файл с общими именованными стилями, ширина столбцов считается
+        при подготовке строк, а пустой столбец-разделитель на втором листе закладывается заранее
+        Args:
+            data: данные
+            prof: название профессии
+            file_name (str): имя сохраняемого xlsx-файла
+            distribution (dict): процентили зарплат (ParseData.distribution) для дополнительных столбцов
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Border, Font, NamedStyle, Side
+        from openpyxl.styles.numbers import FORMAT_PERCENTAGE_00
+        from openpyxl.utils import get_column_letter
+        salary_lvl_by_year = data[0]
+        count_vac_by_year = data[1]
+        salary_lvl_by_year_for_prof = data[2]
+        count_vac_by_year_for_prof = data[3]
+        salary_lvl_by_city = data[4]
+        vacancy_rate_by_city = data[5]
+
+        wb = Workbook(write_only=True)
+        side = Side(border_style='thin', color='000000')
+        border = Border(top=side, bottom=side, left=side, right=side)
+        styles = {'header': NamedStyle('report_header', font=Font(bold=True), border=border),
+                  'cell': NamedStyle('report_cell', border=border),
+                  'percent': NamedStyle('report_percent', border=border, number_format=FORMAT_PERCENTAGE_00)}
+        for style in styles.values():
+            wb.add_named_style(style)
+
+        percentile_names = list(Report.percentile_names) if distribution is not None else []
+        names_sheet1 = ['Год', 'Средняя зарплата', f'Средняя зарплата - {prof}',
+                        'Количество вакансий', f'Количество вакансий - {prof}']
+        names_sheet1 += percentile_names + [f'{name} - {prof}' for name in percentile_names]
+        rows_sheet1 = [[(name, 'header') for name in names_sheet1]]
+        for year, value in salary_lvl_by_year.items():
+            row = [year, value, salary_lvl_by_year_for_prof[year], count_vac_by_year[year],
+                   count_vac_by_year_for_prof[year]]
+            if distribution is not None:
+                row += list(distribution['by_year'][year])
+                row += list(distribution['by_year_for_prof'].get(year, (0,) * len(percentile_names)))
+            rows_sheet1.append([(value, 'cell') for value in row])
+
+        names_sheet2 = ['Город', 'Уровень зарплат'] + percentile_names + [None, 'Город', 'Доля вакансий']
+        separator = 3 + len(percentile_names)
+        rows_sheet2 = [[(name, 'header' if name else None) for name in names_sheet2]]
+        for (town, salary), (rate_town, rate) in zip(salary_lvl_by_city.items(), vacancy_rate_by_city.items()):
+            percentiles = list(distribution['by_city'][town]) if distribution is not None else []
+            rows_sheet2.append([(town, 'cell'), (salary, 'cell')] + [(value, 'cell') for value in percentiles] +
+                               [(None, None), (rate_town, 'cell'), (rate, 'percent')])
+
+        for title, rows, fixed_widths in (('Статистика по годам', rows_sheet1, {}),
+                                          ('Статистика по городам', rows_sheet2, {separator: 2})):
+            ws = wb.create_sheet(title)
+            widths = dict(fixed_widths)
+            for row in rows:
+                for column, (value, _) in enumerate(row, start=1):
+                    if value and column not in fixed_widths:
+                        widths[column] = max(widths.get(column, 0), len(str(value)) + 2)
+            for column, width in widths.items():
+                ws.column_dimensions[get_column_letter(column)].width = width
+            for row in rows:
+                cells = []
+                for value, style in row:
+                    cell = WriteOnlyCell(ws, value=value)
+                    if style is not None:
+                        cell.style = styles[style].name
+                    cells.append(cell)
+                ws.append(cells)
+        wb.save(file_name)
 
-        self.wb.save('report.xlsx')
+    @staticmethod
+    def generate_distribution(distribution, prof, file_name='distribution.png'):
+        """
+        Строит без окон (через Agg) график распределения зарплат по всем вакансиям и по вакансиям профессии:
+        доли вакансий в интервалах укрупнённой логарифмической гистограммы
+        Args:
+            distribution (dict): процентили и гистограммы зарплат (ParseData.distribution)
+            prof: название профессии
+            file_name (str): имя сохраняемого png-файла
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_title('Распределение зарплат')
+        for histogram, label in ((distribution['histogram'], 'Все вакансии'),
+                                 (distribution['histogram_for_prof'], prof)):
+            total = sum(count for _, _, count in histogram)
+            if total == 0:
+                continue
+            edges = [lower for lower, _, _ in histogram] + [histogram[-1][1]]
+            shares = [count / total for _, _, count in histogram]
+            ax.stairs(shares, edges, label=label)
+        ax.set_xscale('log')
+        ax.set_xlabel('Зарплата, руб.', fontsize=8)
+        ax.set_ylabel('Доля вакансий', fontsize=8)
+        ax.tick_params(axis='both', labelsize=8)
+        ax.legend(fontsize=8)
+        ax.grid(axis='y')
+        fig.tight_layout()
+        fig.savefig(file_name)
 
     @staticmethod
     def set_border(ws, side):
         """Устанавливает границу таблицы"""
+        from openpyxl.styles import Border
         for cell in ws._cells.values():
             cell.border = Border(top=side, bottom=side, left=side, right=side)
 
@@ -475,13 +2829,21 @@ class Report:
         for col, value in dims.items():
             ws.column_dimensions[col].width = value + 2
 
-    def generate_image(self, data, prof):
-        """Строит графики по данным"""
+    def generate_image(self, data, prof, file_name='graph.png'):
+        """
+        Строит графики по данным
+        Args:
+            data: данные
+            prof: название профессии
+            file_name (str): имя сохраняемого png-файла
+        """
+        import numpy as np
         count_vac_by_year, count_vac_by_year_for_prof, salary_lvl_by_city, salary_lvl_by_year, salary_lvl_by_year_for_prof, vacancy_rate_by_city, width_12, x_list1_1, x_list1_2, x_nums_1 = self.calculation(
             data)
 
         self.ax1.bar(x_list1_1, salary_lvl_by_year.values(), width_12, label='средняя з/п')
-        self.ax1.bar(x_list1_2, salary_lvl_by_year_for_prof.values(), width_12, label=f'з/п {prof}')
+        self.prof_salary_bars = self.ax1.bar(x_list1_2, salary_lvl_by_year_for_prof.values(), width_12,
+                                             label=f'з/п {prof}')
         self.ax1.set_xticks(x_nums_1, salary_lvl_by_year.keys(), rotation='vertical')
         self.ax1.tick_params(axis='both', labelsize=8)
         self.ax1.legend(fontsize=8)
@@ -492,7 +2854,8 @@ class Report:
         x_list2_2 = x_nums_2 + width_12 / 2
 
         self.ax2.bar(x_list2_1, count_vac_by_year.values(), width_12, label='Количество вакансий')
-        self.ax2.bar(x_list2_2, count_vac_by_year_for_prof.values(), width_12, label=f'Количество вакансий\n{prof}')
+        self.prof_count_bars = self.ax2.bar(x_list2_2, count_vac_by_year_for_prof.values(), width_12,
+                                            label=f'Количество вакансий\n{prof}')
         self.ax2.set_xticks(x_nums_2, count_vac_by_year.keys(), rotation='vertical')
         self.ax2.tick_params(axis='both', labelsize=8)
         self.ax2.legend(fontsize=8)
@@ -522,8 +2885,53 @@ class Report:
 
         self.ax4.pie(data, labels=labels, textprops=textprops, radius=1.1)
 
-        plt.tight_layout()
-        plt.savefig('graph.png')
+        self.template_key = self.get_template_key((salary_lvl_by_year, count_vac_by_year, salary_lvl_by_year_for_prof,
+                                                   count_vac_by_year_for_prof, salary_lvl_by_city, vacancy_rate_by_city))
+        self.fig.tight_layout()
+        self.fig.savefig(file_name)
+
+    @staticmethod
+    def get_template_key(data):
+        """
+        Возвращает описание всего, что на графиках не зависит от профессии: общие ряды по годам,
+        данные по городам и количество столбцов профессии
+        Args:
+            data: данные
+        """
+        return (tuple(data[0].items()), tuple(data[1].items()), len(data[2]), len(data[3]),
+                tuple(data[4].items()), tuple(data[5].items()))
+
+    def update_image(self, data, prof, file_name='graph.png'):
+        """
+        Строит графики для очередной профессии, используя уже нарисованную фигуру как шаблон: если общие данные
+        не изменились, меняются только высоты столбцов профессии и подписи легенды, иначе графики
+        перерисовываются с нуля
+        Args:
+            data: данные
+            prof: название профессии
+            file_name (str): имя сохраняемого png-файла
+        """
+        if getattr(self, 'template_key', None) != self.get_template_key(data):
+            for ax in (self.ax1, self.ax2, self.ax3, self.ax4):
+                title = ax.get_title()
+                ax.clear()
+                ax.set_title(title)
+            self.reset_layout()
+            self.generate_image(data, prof, file_name)
+            return
+
+        for ax, bars, values, label, legend_index in (
+                (self.ax1, self.prof_salary_bars, data[2].values(), f'з/п {prof}', 1),
+                (self.ax2, self.prof_count_bars, data[3].values(), f'Количество вакансий\n{prof}', 1)):
+            for rectangle, value in zip(bars.patches, values):
+                rectangle.set_height(value)
+            bars.set_label(label)
+            ax.get_legend().get_texts()[legend_index].set_text(label)
+            ax.relim()
+            ax.autoscale_view()
+        self.reset_layout()
+        self.fig.tight_layout()
+        self.fig.savefig(file_name)
 
     def search_hyphens(self, salary_lvl_by_city):
         """Ищет дефисы в таблице и добавляет к ним символ переноса строки"""
@@ -538,7 +2946,20 @@ class Report:
             list_names[key] = value
         return list_names
 
+    def reset_layout(self):
+        """Возвращает стандартные отступы фигуры, чтобы tight_layout давал тот же результат, что и на новой фигуре"""
+        import matplotlib as mpl
+        self.fig.subplots_adjust(**{name: mpl.rcParams[f'figure.subplot.{name}']
+                                    for name in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')})
+
+    def close(self):
+        """Закрывает фигуру с графиками, освобождая занятую ей память"""
+        if hasattr(self, 'fig') and not self.headless:
+            import matplotlib.pyplot as plt
+            plt.close(self.fig)
+
     def calculation(self, data):
+        import numpy as np
         salary_lvl_by_year = data[0]
         count_vac_by_year = data[1]
         salary_lvl_by_year_for_prof = data[2]
@@ -552,29 +2973,782 @@ class Report:
         return count_vac_by_year, count_vac_by_year_for_prof, salary_lvl_by_city, salary_lvl_by_year, salary_lvl_by_year_for_prof, vacancy_rate_by_city, width_12, x_list1_1, x_list1_2, x_nums_1
 
 
-def output(data_vacancies, profession_name):
-    """Вывод данных в консоль"""
-    all_data_vacancies = []
-    for data_vacancy in data_vacancies:
-        data_vacancy = Vacancy(dict(zip(column_names, data_vacancy)))
-        all_data_vacancies.append(data_vacancy)
-    data = ParseData()
-    data = data.get_data(all_data_vacancies, profession_name)
+class StageMetrics:
+    """
+    Необязательный сбор метрик по этапам обработки: время, количество строк и скорость, пиковый объём
+    занятой процессом памяти (RSS) и изменение количества выделенных блоков памяти. Для потоковых этапов
+    (чтение, фильтрация, разбор строк) время считается внутри next() каждого этапа, а при указании
+    предыдущего этапа (upstream) из него вычитается время предыдущего этапа. Потоковые этапы выполняются
+    вперемешку, поэтому память для них отдельно не считается: она входит в метрики этапа with,
+    внутри которого потребляются их элементы (например, aggregation). RSS можно узнать только как пик
+    процесса с момента запуска, поэтому для этапа он записывается как process_peak_rss_kb - пик к концу этапа
+    Attributes:
+        enabled: собираются ли метрики (если нет, методы ничего не делают)
+        stages: название этапа -> собранные значения
+    """
+    def __init__(self, enabled=True):
+        """
+        Инициализирует объект StageMetrics
+        Args:
+            enabled (bool): собирать ли метрики
+        """
+        self.enabled = enabled
+        self.stages = {}
+
+    @staticmethod
+    def peak_rss():
+        """Возвращает пиковый объём памяти процесса в килобайтах (None, если его нельзя узнать)"""
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+    def start(self, name, upstream=None, memory=True):
+        """Создаёт запись об этапе (memory - считать ли для этапа метрики памяти)"""
+        stage = self.stages[name] = {'seconds': 0.0, 'rows': 0, 'upstream': upstream}
+        if memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            stage['blocks_before'] = sys.getallocatedblocks()
+        return stage
+
+    def finish(self, stage):
+        """Дополняет запись об этапе метриками памяти, если они считаются для этого этапа"""
+        if 'blocks_before' not in stage:
+            return
+        stage['allocated_blocks'] = sys.getallocatedblocks() - stage.pop('blocks_before')
+        stage['process_peak_rss_kb'] = self.peak_rss()
+        if tracemalloc.is_tracing():
+            stage['traced_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+
+    @contextmanager
+    def stage(self, name, rows=0, upstream=None):
+        """
+        Замеряет этап, выполняемый внутри блока with
+        Args:
+            name (str): название этапа
+            rows (int): количество обработанных строк (можно изменить позже через stages[name]['rows'])
+            upstream (str): этап, время которого входит во время этого этапа и должно быть вычтено
+        """
+        if not self.enabled:
+            yield None
+            return
+        stage = self.start(name, upstream)
+        stage['rows'] = rows
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage['seconds'] += time.perf_counter() - start
+            self.finish(stage)
+
+    def wrap(self, name, iterable, upstream=None):
+        """
+        Оборачивает потоковый этап: считает элементы и время, проведённое в next() (без метрик памяти)
+        Args:
+            name (str): название этапа
+            iterable: итерируемый объект этапа
+            upstream (str): этап, из которого этот этап берёт данные
+
+        Returns:
+            итерируемый объект с теми же элементами
+        """
+        if not self.enabled:
+            return iterable
+        return self.wrap_iterator(self.start(name, upstream, memory=False), iter(iterable))
+
+    def wrap_iterator(self, stage, iterator):
+        """Генератор, отдающий элементы iterator и накапливающий метрики в stage"""
+        perf_counter = time.perf_counter
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stage['seconds'] += perf_counter() - start
+                stage['rows'] += 1
+                yield item
+        finally:
+            self.finish(stage)
+
+    def summary(self):
+        """
+        Возвращает итоговые метрики: для этапов с upstream время указывается без учёта предыдущего этапа
+
+        Returns:
+            dict: название этапа -> метрики
+        """
+        summary = {}
+        for name, stage in self.stages.items():
+            seconds = stage['seconds']
+            upstream = self.stages.get(stage['upstream'])
+            if upstream is not None:
+                seconds = max(seconds - upstream['seconds'], 0.0)
+            summary[name] = {'seconds': round(seconds, 6), 'rows': stage['rows'],
+                             'rows_per_second': round(stage['rows'] / seconds, 1) if seconds and stage['rows'] else None,
+                             **{key: value for key, value in stage.items() if key not in ('seconds', 'rows', 'upstream')}}
+        return summary
+
+    def write(self, destination='-'):
+        """
+        Записывает итоговые метрики в JSON-файл или, если destination равен '-', одной строкой в stderr
+        Args:
+            destination (str): имя файла или '-'
+        """
+        text = json.dumps({'stages': self.summary(), 'peak_rss_kb': self.peak_rss()}, ensure_ascii=False)
+        if destination == '-':
+            print(text, file=sys.stderr)
+            return
+        with open(destination, 'w', encoding='utf_8') as file:
+            file.write(text)
+
+
+class Pipeline:
+    """
+    Конвейерный режим: текущий процесс только читает строки файла (в том числе сжатого или разбитого на части)
+    и отправляет их пачками текста в пул процессов, где строки разбираются, проверяются и агрегируются;
+    частичная статистика пачек объединяется в порядке следования пачек. Разбор и агрегация выполняются
+    в процессах, а не в потоках, потому что это код на Python и в одном процессе его сериализовала бы GIL.
+    Количество ещё не объединённых пачек ограничено, поэтому память не растёт с размером файла.
+    xlsx-документ и графики сохраняются одновременно (графики - в отдельном процессе, который запускается
+    заранее, чтобы импорт matplotlib шёл параллельно с подсчётом статистики).
+    На одноядерном процессоре и для колоночного хранилища всё выполняется последовательно в текущем процессе
+    Attributes:
+        batch_size: количество строк в одной пачке
+        queue_size: максимальное количество необъединённых пачек на один процесс
+        workers: количество процессов для разбора и агрегации
+        chart_executor: пул из одного процесса для построения графиков (None, если графики не нужны
+        или процессор одноядерный - тогда графики строятся после xlsx-документа в текущем процессе)
+    """
+    batch_size = 50_000
+    queue_size = 4
+
+    def __init__(self, image=True):
+        """
+        Инициализирует объект Pipeline
+        Args:
+            image (bool): будут ли строиться графики (тогда сразу запускается процесс для них)
+        """
+        self.workers = os.cpu_count() or 1
+        self.chart_executor = None
+        if image and self.workers > 1:
+            self.chart_executor = ProcessPoolExecutor(max_workers=1)
+            self.chart_executor.submit(render_charts, [])
+
+    @staticmethod
+    def inspect_batch(task):
+        """
+        Разбирает, проверяет и агрегирует одну пачку строк (выполняется в отдельном процессе)
+        Args:
+            task: кортеж (названия столбцов, текст пачки строк, профессия, фильтр вакансий,
+            файл карантина этой пачки)
+
+        Returns:
+            ParseData: объект с данными по этой пачке
+            RowValidator: проверка строк этой пачки со счётчиками отклонённых строк
+        """
+        columns_names, text, prof, vacancy_filter, quarantine = task
+        data = ParseData(vacancy_filter)
+        validator = RowValidator(columns_names, quarantine=quarantine)
+        rows = validator.validate(csv.reader(io.StringIO(text)))
+        data.inspection_vacancy(prof, VacancyRecord.from_rows(columns_names, rows))
+        return data, validator
+
+    def read_batches(self, file_name):
+        """
+        Читает строки всех файлов-частей без разбора и отдаёт их пачками текста (заголовки частей проверяются
+        на совпадение). Пачка заканчивается только на границе записи: если число кавычек в ней нечётно,
+        последняя запись содержит перевод строки внутри поля в кавычках, и к пачке дочитываются строки,
+        пока поле не закроется
+        Args:
+            file_name (str): имя csv-файла, папки или шаблон имени с файлами-частями
+
+        Returns:
+            генератор пар (названия столбцов, текст пачки строк)
+        """
+        columns_names = None
+        for shard in DataSet.expand_sources(file_name):
+            with DataSet.open_text(shard) as file:
+                header = next(csv.reader([file.readline()]), None)
+                if header is None:
+                    continue
+                columns_names = columns_names or header
+                DataSet.check_header(columns_names, header, shard)
+                while True:
+                    lines = list(islice(file, self.batch_size))
+                    if not lines:
+                        break
+                    quotes = sum(line.count('"') for line in lines)
+                    while quotes % 2:
+                        line = file.readline()
+                        if not line:
+                            break
+                        lines.append(line)
+                        quotes += line.count('"')
+                    yield columns_names, ''.join(lines)
+        if columns_names is None:
+            print('Пустой файл')
+            sys.exit(1)
+
+    def aggregate(self, file_name, prof, vacancy_filter=None, quarantine=None):
+        """
+        Собирает статистику, отправляя пачки строк в пул процессов по мере чтения файла
+        Args:
+            file_name (str): имя csv-файла, папки или шаблон имени с файлами-частями (или папки колоночного хранилища)
+            prof: профессия
+            vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+            quarantine (str): имя csv-файла для отклонённых строк (пачки пишут свои файлы, которые затем
+            объединяются в порядке пачек)
+
+        Returns:
+            ParseData: статистика, ещё не сведённая в итоговые словари методом get_results
+            (в validator - счётчики отклонённых строк)
+        """
+        data = ParseData(vacancy_filter)
+        if self.workers == 1 or ColumnStore.is_store(file_name):
+            dataset = DataSet(file_name, streaming=True, quarantine=quarantine)
+            data.inspection_vacancy(prof, VacancyRecord.from_rows(dataset.columns_names, dataset.vacancies_data))
+            data.validator = dataset.validator
+            return data
+
+        def merge(future):
+            part, validator = future.result()
+            data.merge(part)
+            data.validator.merge(validator)
+
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=ParseData.init_worker,
+                                 initargs=(ParseData.currency_rates, SalaryStat.sketches)) as executor:
+            for number, (columns_names, text) in enumerate(self.read_batches(file_name)):
+                if data.validator is None:
+                    data.validator = RowValidator(columns_names, quarantine=quarantine)
+                task = (columns_names, text, prof, vacancy_filter, quarantine and f'{quarantine}.part{number}')
+                pending.append(executor.submit(self.inspect_batch, task))
+                if len(pending) >= self.queue_size * self.workers:
+                    merge(pending.popleft())
+            while pending:
+                merge(pending.popleft())
+        return data
+
+    def save_reports(self, data, prof, excel_file=None, image_file=None, streaming_excel=False,
+                     distribution=None, distribution_file=None):
+        """
+        Сохраняет xlsx-документ в текущем процессе одновременно с построением графиков в процессе chart_executor
+        Args:
+            data: кортеж из шести словарей со статистикой
+            prof: профессия
+            excel_file (str): имя xlsx-файла (None - документ не нужен)
+            image_file (str): имя png-файла (None - графики не нужны)
+            streaming_excel (bool): сохранять xlsx-документ в потоковом режиме
+            distribution (dict): процентили и гистограммы зарплат (ParseData.distribution)
+            distribution_file (str): имя png-файла для графика распределения зарплат (None - график не нужен)
+        """
+        charts = []
+        if image_file is not None:
+            charts.append((render_charts, [(data, prof, image_file)]))
+        if distribution_file is not None:
+            charts.append((Report.generate_distribution, distribution, prof, distribution_file))
+        futures = []
+        if self.chart_executor is not None:
+            futures = [self.chart_executor.submit(*chart) for chart in charts]
+        if excel_file is not None and streaming_excel:
+            Report.generate_excel_streaming(data, prof, excel_file, distribution)
+        elif excel_file is not None:
+            Report(image=False).generate_excel(data, prof, excel_file, distribution)
+        for future in futures:
+            future.result()
+        if self.chart_executor is None:
+            for function, *chart_args in charts:
+                function(*chart_args)
+
+    def close(self):
+        """Завершает процесс для построения графиков"""
+        if self.chart_executor is not None:
+            self.chart_executor.shutdown()
+
+
+def collect_data(data_vacancies, profession_name, columns_names, columnar=False, vacancy_filter=None):
+    """
+    Считает статистику по строкам csv-файла (или по колоночному хранилищу)
+    Args:
+        data_vacancies: строки csv-файла с данными о вакансиях
+        profession_name: название профессии
+        columns_names (list): названия столбцов в csv-файле
+        columnar (bool): если True, статистика считается на массивах NumPy (ColumnarData)
+        vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+
+    Returns:
+        кортеж из шести словарей со статистикой
+    """
+    return aggregate_data(data_vacancies, profession_name, columns_names, columnar, vacancy_filter).get_results()
+
+
+def aggregate_data(data_vacancies, profession_name, columns_names, columnar=False, vacancy_filter=None):
+    """
+    Собирает статистику по строкам csv-файла (или по колоночному хранилищу) в объект ParseData,
+    ещё не сведённый в итоговые словари
+    Args:
+        data_vacancies: строки csv-файла с данными о вакансиях
+        profession_name: название профессии
+        columns_names (list): названия столбцов в csv-файле
+        columnar (bool): если True, статистика считается на массивах NumPy (ColumnarData)
+        vacancy_filter (VacancyFilter): отбор учитываемых вакансий (в колоночном хранилище - по кодам
+        столбцов, ColumnStore.select_rows)
+
+    Returns:
+        ParseData
+    """
+    data = ParseData(vacancy_filter)
+    if columnar and isinstance(data_vacancies, ColumnStore):
+        ColumnarData.from_store(data_vacancies, data.vacancy_filter).inspection_vacancy(profession_name, data)
+    elif columnar:
+        ColumnarData(columns_names, data_vacancies, data.vacancy_filter).inspection_vacancy(profession_name, data)
+    else:
+        data.inspection_vacancy(profession_name, VacancyRecord.from_rows(columns_names, data_vacancies))
+    return data
+
 
+def print_data(data, distribution=None):
+    """
+    Выводит статистику в консоль
+    Args:
+        data: кортеж из шести словарей со статистикой
+        distribution (dict): процентили зарплат (ParseData.distribution), если они собирались
+    """
     print(f'Динамика уровня зарплат по годам: {data[0]}')
     print(f'Динамика количества вакансий по годам: {data[1]}')
     print(f'Динамика уровня зарплат по годам для выбранной профессии: {data[2]}')
     print(f'Динамика количества вакансий по годам для выбранной профессии: {data[3]}')
     print(f'Уровень зарплат по городам (в порядке убывания): {data[4]}')
     print(f'Доля вакансий по городам (в порядке убывания): {data[5]}')
+    if distribution is not None:
+        print(f'Процентили зарплат по годам (10%, 50%, 90%): {distribution["by_year"]}')
+        print(f'Процентили зарплат по годам для выбранной профессии (10%, 50%, 90%): '
+              f'{distribution["by_year_for_prof"]}')
+        print(f'Процентили зарплат по городам (10%, 50%, 90%): {distribution["by_city"]}')
+
 
+def output(data_vacancies, profession_name, columns_names, columnar=False):
+    """
+    Вывод данных в консоль
+    Args:
+        data_vacancies: строки csv-файла с данными о вакансиях
+        profession_name: название профессии
+        columns_names (list): названия столбцов в csv-файле
+        columnar (bool): если True, статистика считается на массивах NumPy (ColumnarData)
+    """
+    data = collect_data(data_vacancies, profession_name, columns_names, columnar)
+    print_data(data)
     return data
 
 
-users_input = UsersInput()
-dataset = DataSet(users_input.file_name)
-(column_names, vacancies_data) = dataset.columns_names, dataset.vacancies_data
-output_data = output(vacancies_data, users_input.profession_name)
-report = Report()
-report.generate_excel(output_data, users_input.profession_name)
-report.generate_image(output_data, users_input.profession_name)
+def read_professions(file_name):
+    """
+    Читает список профессий из файла (по одной профессии в строке, пустые строки пропускаются)
+    Args:
+        file_name (str): имя файла со списком профессий
+
+    Returns:
+        list: список профессий
+    """
+    with open(file_name, encoding='utf_8_sig') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def render_charts(tasks):
+    """
+    Строит графики для нескольких профессий на одной фигуре-шаблоне (Report.update_image) без окон, через Agg
+    Args:
+        tasks: список кортежей (данные, профессия, имя png-файла)
+
+    Returns:
+        list: пары (имя png-файла, время построения в секундах)
+    """
+    report = Report(excel=False, headless=True)
+    timings = []
+    for data, prof, file_name in tasks:
+        start = time.perf_counter()
+        report.update_image(data, prof, file_name)
+        timings.append((file_name, time.perf_counter() - start))
+    return timings
+
+
+def render_charts_parallel(tasks, workers=None):
+    """
+    Распределяет построение графиков по процессам: каждый процесс получает непрерывную часть списка
+    и строит её на своей фигуре-шаблоне
+    Args:
+        tasks: список кортежей (данные, профессия, имя png-файла)
+        workers (int): количество процессов (по умолчанию - количество ядер процессора)
+
+    Returns:
+        list: пары (имя png-файла, время построения в секундах) в порядке tasks
+    """
+    workers = max(min(workers or os.cpu_count() or 1, len(tasks)), 1)
+    if workers == 1:
+        return render_charts(tasks)
+    size = -(-len(tasks) // workers)
+    parts = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [timing for timings in executor.map(render_charts, parts) for timing in timings]
+
+
+def save_reports(results, output_dir='.', outputs=('excel', 'image'), streaming_excel=False, chart_workers=None):
+    """
+    Сохраняет отчёты для нескольких профессий
+    Args:
+        results (dict): профессия -> кортеж из шести словарей со статистикой
+        output_dir (str): папка для отчётов (report_<профессия>.xlsx и graph_<профессия>.png)
+        outputs: какие отчёты нужны ('console', 'excel', 'image')
+        streaming_excel (bool): сохранять xlsx-отчёты в потоковом режиме (Report.generate_excel_streaming)
+        chart_workers (int): если задано, графики строятся на фигурах-шаблонах в заданном количестве процессов
+        (render_charts_parallel), а время построения каждого графика выводится в stderr
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    chart_tasks = []
+    for prof, data in results.items():
+        if 'console' in outputs:
+            print(f'Профессия: {prof}')
+            print_data(data)
+        if 'excel' not in outputs and 'image' not in outputs:
+            continue
+        safe_name = re.sub(r'[\\/:*?"<>|\s]+', '_', prof)
+        if 'image' in outputs and chart_workers is not None:
+            chart_tasks.append((data, prof, os.path.join(output_dir, f'graph_{safe_name}.png')))
+        report = Report(excel='excel' in outputs and not streaming_excel,
+                        image='image' in outputs and chart_workers is None)
+        if 'excel' in outputs and streaming_excel:
+            report.generate_excel_streaming(data, prof, os.path.join(output_dir, f'report_{safe_name}.xlsx'))
+        elif 'excel' in outputs:
+            report.generate_excel(data, prof, os.path.join(output_dir, f'report_{safe_name}.xlsx'))
+        if 'image' in outputs and chart_workers is None:
+            report.generate_image(data, prof, os.path.join(output_dir, f'graph_{safe_name}.png'))
+        report.close()
+
+    if chart_tasks:
+        for file_name, seconds in render_charts_parallel(chart_tasks, chart_workers):
+            print(f'{file_name}: {seconds:.3f} с', file=sys.stderr)
+
+
+def batch_output(file_name, professions, output_dir='.', outputs=('excel', 'image'), streaming_excel=False,
+                 chart_workers=None, vacancy_filter=None):
+    """
+    Считает статистику для нескольких профессий за один проход по csv-файлу и сохраняет отчёт для каждой из них
+    Args:
+        file_name (str): имя csv-файла с вакансиями
+        professions: список профессий или имя файла со списком профессий
+        output_dir (str): папка для отчётов (report_<профессия>.xlsx и graph_<профессия>.png)
+        outputs: какие отчёты нужны ('console', 'excel', 'image')
+        streaming_excel (bool): сохранять xlsx-отчёты в потоковом режиме (Report.generate_excel_streaming)
+        chart_workers (int): количество процессов для построения графиков (см. save_reports)
+        vacancy_filter (VacancyFilter): отбор учитываемых вакансий
+
+    Returns:
+        dict: профессия -> кортеж из шести словарей со статистикой
+    """
+    if isinstance(professions, str):
+        professions = read_professions(professions)
+    dataset = DataSet(file_name, streaming=True)
+    batch = ProfessionsBatch(professions, vacancy_filter)
+    batch.inspection_vacancy(VacancyRecord.from_rows(dataset.columns_names, dataset.vacancies_data))
+    results = batch.get_results()
+    save_reports(results, output_dir, outputs, streaming_excel, chart_workers)
+    return results
+
+
+def parse_args(argv=None):
+    """
+    Разбирает аргументы командной строки: профессии из --professions-file добавляются к professions,
+    а параметры, которые не поддерживаются с несколькими профессиями, отклоняются
+    Args:
+        argv (list): аргументы (по умолчанию - sys.argv[1:])
+
+    Returns:
+        argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description='Статистика по вакансиям. Без аргументов имя файла и профессия запрашиваются интерактивно')
+    parser.add_argument('file_name', nargs='?',
+                        help='csv-файл с вакансиями (в том числе .gz, .bz2, .xz), папка или шаблон имени '
+                             'с файлами-частями или папка колоночного хранилища')
+    parser.add_argument('-p', '--profession', dest='professions', action='append', default=[],
+                        help='профессия (можно указать несколько раз - тогда отчёты строятся в пакетном режиме)')
+    parser.add_argument('--professions-file', help='файл со списком профессий, по одной в строке')
+    parser.add_argument('--outputs', nargs='+', choices=('console', 'excel', 'image'),
+                        default=['console', 'excel', 'image'], help='какие результаты выводить')
+    parser.add_argument('--excel', default='report.xlsx', help='имя xlsx-отчёта')
+    parser.add_argument('--image', default='graph.png', help='имя png-файла с графиками')
+    parser.add_argument('--streaming-excel', action='store_true',
+                        help='сохранять xlsx-отчёт в потоковом режиме openpyxl (write-only)')
+    parser.add_argument('--chart-workers', type=int, metavar='N',
+                        help='в пакетном режиме строить графики без окон на фигурах-шаблонах в N процессах')
+    parser.add_argument('--output-dir', default='.', help='папка для отчётов в пакетном режиме')
+    parser.add_argument('--workers', type=int, help='обрабатывать файл параллельно в заданном количестве процессов')
+    parser.add_argument('--columnar', action='store_true', help='считать статистику на массивах NumPy')
+    parser.add_argument('--cache', nargs='?', const='.vacancy_cache', metavar='DIR',
+                        help='использовать дисковый кэш статистики (по умолчанию в папке .vacancy_cache)')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='удалить из кэша запись для файла (или весь кэш, если файл не указан) и выйти')
+    parser.add_argument('--convert-to', metavar='DIR', help='перевести csv-файл в колоночное хранилище и выйти')
+    parser.add_argument('--state', help='файл состояния для инкрементального обновления статистики')
+    parser.add_argument('--delta', action='append', default=[],
+                        help='csv-файл с новыми вакансиями для инкрементального режима')
+    parser.add_argument('--years', type=VacancyFilter.parse_years, metavar='ГОД[-ГОД]',
+                        help='учитывать только вакансии, опубликованные в эти годы (например, 2019-2022)')
+    parser.add_argument('--area', dest='areas', action='append', default=[],
+                        help='учитывать только вакансии из этого региона (можно указать несколько раз)')
+    parser.add_argument('--currency', dest='currencies', action='append', default=[],
+                        help='учитывать только вакансии с зарплатой в этой валюте (можно указать несколько раз)')
+    parser.add_argument('--serve', nargs='?', type=int, const=8000, metavar='PORT',
+                        help='запустить HTTP-сервер статистики: GET /profession?name=<профессия> (порт по умолчанию 8000)')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес HTTP-сервера статистики')
+    parser.add_argument('--percentiles', action='store_true',
+                        help='собирать гистограммы зарплат и выводить медиану, 10-й и 90-й процентили')
+    parser.add_argument('--distribution-chart', metavar='FILE',
+                        help='сохранить график распределения зарплат в png-файл (включает --percentiles)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='конвейерный режим: чтение файла одновременно с разбором и агрегацией пачек строк '
+                             'в пуле процессов, xlsx-документ и графики одновременно')
+    parser.add_argument('--quarantine', metavar='FILE',
+                        help='записать отклонённые при проверке строки в csv-файл вместе с причиной')
+    parser.add_argument('--rates', metavar='FILE',
+                        help='таблица курсов валют по месяцам (csv со столбцами currency, date, rate или json)')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FILE',
+                        help='собрать метрики по этапам и записать их в JSON-файл (без имени файла - в stderr)')
+    parser.add_argument('--profile', metavar='FILE', help='сохранить статистику cProfile в файл')
+    parser.add_argument('--tracemalloc', metavar='FILE', help='сохранить снимок tracemalloc в файл')
+    args = parser.parse_args(argv)
+    if args.delta and not args.state:
+        parser.error('--delta можно указать только вместе с --state')
+    if args.professions_file:
+        try:
+            args.professions += read_professions(args.professions_file)
+        except OSError:
+            parser.error(f'не удалось прочитать файл со списком профессий {args.professions_file}')
+    if len(args.professions) > 1:
+        unsupported = [option for option, value in (('--state', args.state), ('--workers', args.workers),
+                                                    ('--pipeline', args.pipeline), ('--columnar', args.columnar),
+                                                    ('--quarantine', args.quarantine),
+                                                    ('--percentiles', args.percentiles),
+                                                    ('--distribution-chart', args.distribution_chart)) if value]
+        if unsupported:
+            parser.error(f'с несколькими профессиями не поддерживается: {", ".join(unsupported)}')
+    return args
+
+
+def main(argv=None):
+    """
+    Точка входа: считает статистику и строит отчёты согласно аргументам командной строки
+    Args:
+        argv (list): аргументы (по умолчанию - sys.argv[1:])
+    """
+    args = parse_args(argv)
+    metrics = StageMetrics(enabled=args.metrics is not None)
+    SalaryStat.sketches = args.percentiles or args.distribution_chart is not None
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        run(args, metrics)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.tracemalloc:
+            tracemalloc.take_snapshot().dump(args.tracemalloc)
+            tracemalloc.stop()
+        if args.metrics is not None:
+            metrics.write(args.metrics)
+
+
+def run(args, metrics):
+    """
+    Считает статистику и строит отчёты
+    Args:
+        args (argparse.Namespace): разобранные аргументы командной строки
+        metrics (StageMetrics): объект для сбора метрик по этапам
+    """
+    if args.rates:
+        ParseData.currency_rates = CurrencyRates.from_file(args.rates, ParseData.currency_to_rub)
+    if args.clear_cache:
+        AggregateCache(args.cache or '.vacancy_cache').invalidate(args.file_name)
+        return
+
+    if args.file_name is None:
+        users_input = UsersInput()
+        file_name, professions = users_input.file_name, [users_input.profession_name]
+    else:
+        file_name = args.file_name
+        if not (os.path.isdir(file_name) or DataSet.is_pattern(file_name)):
+            file_name = UsersInput.check_file_name(file_name)
+        professions = args.professions
+
+    if args.convert_to:
+        ColumnStore.convert(file_name, args.convert_to)
+        return
+
+    if ColumnStore.is_store(file_name) and (args.cache or args.state or args.workers):
+        print('Колоночное хранилище не поддерживается вместе с --cache, --state и --workers: '
+              'оно уже читается без разбора текста (используйте --columnar)')
+        sys.exit(1)
+    if args.cache or args.state:
+        shards = DataSet.expand_sources(file_name)
+        if len(shards) > 1 or args.state and DataSet.is_compressed(shards[0]):
+            print('Кэш поддерживается только для одного файла, инкрементальный режим - для одного несжатого файла')
+            sys.exit(1)
+
+    vacancy_filter = VacancyFilter(args.years, args.areas, args.currencies)
+    if not vacancy_filter.is_empty and (args.serve is not None or args.cache or args.state):
+        print('Фильтры по годам, регионам и валютам не поддерживаются вместе с --serve, --cache и --state')
+        sys.exit(1)
+
+    if args.quarantine and (args.cache or args.state):
+        print('--quarantine не поддерживается вместе с --cache и --state: строки сохранённой статистики не перечитываются')
+        sys.exit(1)
+
+    if args.serve is not None:
+        aggregates = AggregateCache(args.cache).load(file_name) if args.cache else VacancyAggregates.from_file(file_name)
+        QueryService(aggregates).serve(args.host, args.serve)
+        return
+
+    if not professions:
+        UsersInput.check_profession_name('')
+    professions = [UsersInput.check_profession_name(prof) for prof in professions]
+    outputs = set(args.outputs)
+
+    if len(professions) > 1:
+        if args.cache:
+            aggregates = AggregateCache(args.cache).load(file_name)
+            save_reports({prof: aggregates.get_data(prof) for prof in professions}, args.output_dir, outputs,
+                         args.streaming_excel, args.chart_workers)
+        else:
+            batch_output(file_name, professions, args.output_dir, outputs, args.streaming_excel, args.chart_workers,
+                         vacancy_filter)
+        return
+
+    prof = professions[0]
+    if args.pipeline:
+        pipeline = Pipeline(image='image' in outputs or args.distribution_chart is not None)
+        try:
+            with metrics.stage('statistics'):
+                statistics = pipeline.aggregate(file_name, prof, vacancy_filter, args.quarantine)
+                if statistics.validator is not None:
+                    report_rejections(statistics.validator, metrics, args.quarantine)
+                check_statistics(statistics)
+                data = statistics.get_results()
+            if 'console' in outputs:
+                print_data(data, statistics.distribution)
+            with metrics.stage('reports'):
+                pipeline.save_reports(data, prof, args.excel if 'excel' in outputs else None,
+                                      args.image if 'image' in outputs else None, args.streaming_excel,
+                                      statistics.distribution, args.distribution_chart)
+        finally:
+            pipeline.close()
+        return
+    if args.state or args.cache or args.workers or args.columnar:
+        with metrics.stage('statistics'):
+            statistics = compute_data(args, file_name, prof, vacancy_filter)
+            if statistics.validator is not None:
+                report_rejections(statistics.validator, metrics, args.quarantine)
+            check_statistics(statistics)
+            data = statistics.get_results()
+    else:
+        dataset = DataSet(file_name, streaming=True, metrics=metrics, quarantine=args.quarantine)
+        vacancies = metrics.wrap('vacancy_formatting', VacancyRecord.from_rows(dataset.columns_names,
+                                                                                dataset.vacancies_data),
+                                 upstream='row_filtering')
+        statistics = ParseData(vacancy_filter)
+        with metrics.stage('aggregation', upstream='vacancy_formatting') as stage:
+            statistics.inspection_vacancy(prof, vacancies)
+            if stage is not None:
+                stage['rows'] = statistics.count_vac_by_year.length
+        if dataset.validator is not None:
+            report_rejections(dataset.validator, metrics, args.quarantine)
+        check_statistics(statistics)
+        with metrics.stage('ranking', len(statistics.salary_lvl_by_city.salary_dict)):
+            data = statistics.get_results()
+
+    distribution = statistics.distribution
+    if 'console' in outputs:
+        print_data(data, distribution)
+    if 'excel' in outputs or 'image' in outputs:
+        report = Report(excel='excel' in outputs and not args.streaming_excel, image='image' in outputs)
+        with metrics.stage('excel_write', len(data[0]) + len(data[4])):
+            if 'excel' in outputs and args.streaming_excel:
+                report.generate_excel_streaming(data, prof, args.excel, distribution)
+            elif 'excel' in outputs:
+                report.generate_excel(data, prof, args.excel, distribution)
+        with metrics.stage('image_render'):
+            if 'image' in outputs:
+                report.generate_image(data, prof, args.image)
+    if args.distribution_chart is not None:
+        with metrics.stage('distribution_render'):
+            Report.generate_distribution(distribution, prof, args.distribution_chart)
+
+
+def report_rejections(validator, metrics, quarantine=None):
+    """
+    Добавляет счётчики отклонённых строк в метрики и выводит сводку в stderr, если строки отклонялись
+    не только из-за пустых значений или задан файл карантина
+    Args:
+        validator (RowValidator): проверка строк со счётчиками отклонённых строк
+        metrics (StageMetrics): объект для сбора метрик по этапам
+        quarantine (str): имя файла карантина
+    """
+    if metrics.enabled and 'row_filtering' in metrics.stages:
+        metrics.stages['row_filtering']['rejected'] = dict(validator.counters)
+    if set(validator.counters) - {'empty_field'} or quarantine:
+        print(validator.get_report(), file=sys.stderr)
+
+
+def check_statistics(statistics):
+    """
+    Завершает работу, если под фильтр не попало ни одной вакансии
+    Args:
+        statistics (ParseData): собранная статистика
+    """
+    if statistics.count_vac_by_year.length == 0:
+        print('Нет данных')
+        sys.exit(1)
+
+
+def compute_data(args, file_name, prof, vacancy_filter=None):
+    """
+    Считает статистику для одной профессии выбранным в аргументах способом
+    (инкрементально, через кэш, параллельно или на массивах NumPy)
+    Args:
+        args (argparse.Namespace): разобранные аргументы командной строки
+        file_name (str): имя csv-файла или папки колоночного хранилища
+        prof (str): профессия
+        vacancy_filter (VacancyFilter): отбор учитываемых вакансий (не поддерживается инкрементальным режимом и кэшем)
+
+    Returns:
+        ParseData: статистика, ещё не сведённая в итоговые словари методом get_results
+    """
+    if args.state:
+        statistics = IncrementalStatistics(args.state)
+        statistics.update(file_name)
+        for delta_file in args.delta:
+            statistics.add_delta(delta_file)
+        statistics.save()
+        return statistics.aggregates.get_parse_data(prof)
+    if args.cache:
+        return AggregateCache(args.cache).load(file_name).get_parse_data(prof)
+    if args.workers:
+        return ParseData.from_file_parallel(file_name, prof, args.workers, vacancy_filter, args.quarantine)
+    dataset = DataSet(file_name, streaming=True, quarantine=args.quarantine)
+    statistics = aggregate_data(dataset.vacancies_data, prof, dataset.columns_names, args.columnar, vacancy_filter)
+    statistics.validator = dataset.validator
+    return statistics
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Проверки того, что ускоренные режимы обработки дают тот же результат, что и последовательная обработка
+csv-файла через DataSet. Файл для проверок содержит столбец key_skills с переводами строк внутри полей
+в кавычках, как в выгрузках hh.ru
+
+Запуск из корня репозитория:
+    python -m pytest -q tests
+"""
+import csv
+import random
+import statistics
+
+import pytest
+
+import main
+from benchmarks.generate import COLUMNS, generate_rows
+
+PROFESSION = 'Программист'
+SKILLS = ['Python', 'SQL', 'Git', 'Linux, bash', 'Работа с "1С"', 'Excel']
+
+
+def write_multiline_file(file_name, count, seed=0):
+    """
+    Записывает синтетический csv-файл с вакансиями и многострочным столбцом key_skills
+    Args:
+        file_name (str): имя файла
+        count (int): количество строк (без заголовка)
+        seed (int): зерно генератора случайных чисел
+    """
+    rnd = random.Random(seed)
+    with open(file_name, 'w', encoding='utf_8_sig', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS[:1] + ['key_skills'] + COLUMNS[1:])
+        for row in generate_rows(count, seed, malformed=0.01):
+            skills = '\n'.join(rnd.sample(SKILLS, rnd.randint(1, 4)))
+            writer.writerow(row[:1] + [skills] + row[1:])
+
+
+@pytest.fixture(scope='module')
+def multiline_file(tmp_path_factory):
+    """Имя csv-файла с многострочными полями"""
+    file_name = str(tmp_path_factory.mktemp('data') / 'vacancies.csv')
+    write_multiline_file(file_name, 6000)
+    return file_name
+
+
+@pytest.fixture(scope='module')
+def serial(multiline_file):
+    """Статистика и счётчики отклонённых строк, посчитанные последовательно"""
+    dataset = main.DataSet(multiline_file, streaming=True)
+    data = main.aggregate_data(dataset.vacancies_data, PROFESSION, dataset.columns_names)
+    return data.get_results(), dict(dataset.validator.counters)
+
+
+def test_serial_reads_multiline_fields(serial):
+    """Многострочные поля не приводят к отклонению строк (отклоняются только испорченные генератором)"""
+    results, counters = serial
+    assert set(counters) <= {'empty_field', 'column_count'}
+    assert sum(results[1].values()) > 5000
+
+
+@pytest.mark.parametrize('workers', [1, 3, 7])
+def test_workers_match_serial(multiline_file, serial, workers):
+    """--workers: части файла начинаются на границах записей, итог совпадает с последовательной обработкой"""
+    data = main.ParseData.from_file_parallel(multiline_file, PROFESSION, workers)
+    assert data.get_results() == serial[0]
+    assert data.validator.counters == serial[1]
+
+
+def test_chunks_start_on_records(multiline_file, serial):
+    """Части файла, прочитанные по отдельности, отклоняют те же строки, что и последовательное чтение"""
+    columns_names, chunks = main.DataSet.split_into_chunks(multiline_file, 20)
+    assert len(chunks) > 1
+    total = main.RowValidator(columns_names)
+    for start, end in chunks:
+        validator = main.RowValidator(columns_names)
+        list(main.DataSet.read_chunk(multiline_file, start, end, columns_names, validator))
+        total.merge(validator)
+    assert total.counters == serial[1]
+
+
+def test_mean_matches_statistics():
+    """Среднее считается по точной сумме и совпадает со statistics.mean при любом порядке слияния"""
+    rnd = random.Random(1)
+    values = [1074.7, 787.5999999999999, 624318.7] + [rnd.uniform(1e3, 1e6) for _ in range(1000)]
+    left, right = main.SalaryStat(), main.SalaryStat()
+    for index, value in enumerate(values):
+        (left if index % 2 else right).add(value)
+    right.merge(left)
+    assert right.mean == statistics.mean(values)
+
+
+def test_columnar_matches_serial(multiline_file, serial):
+    """--columnar: средние по годам и городам совпадают с последовательной обработкой"""
+    dataset = main.DataSet(multiline_file, streaming=True)
+    data = main.aggregate_data(dataset.vacancies_data, PROFESSION, dataset.columns_names, columnar=True)
+    assert data.get_results() == serial[0]
+
+
+def test_store_index_matches_scan(multiline_file, tmp_path):
+    """Отбор строк хранилища по индексам столбцов совпадает с проверкой всех строк"""
+    store = main.ColumnStore.convert(multiline_file, str(tmp_path / 'store'))
+    scan = main.ColumnStore(store.directory)
+    scan.indexes = {}
+    areas = store.dictionaries['area_name']
+    for vacancy_filter in (main.VacancyFilter((2015, 2020)), main.VacancyFilter(areas=areas[:3]),
+                           main.VacancyFilter((2010, 2022), areas[::2], ['RUR', 'USD'])):
+        assert store.select_rows(vacancy_filter).tolist() == scan.select_rows(vacancy_filter).tolist()
+
+
+def test_pipeline_matches_serial(multiline_file, serial):
+    """--pipeline: пачки строк заканчиваются на границах записей, итог совпадает с последовательной обработкой"""
+    pipeline = main.Pipeline(image=False)
+    pipeline.workers, pipeline.batch_size = 3, 500
+    data = pipeline.aggregate(multiline_file, PROFESSION)
+    assert data.get_results() == serial[0]
+    assert data.validator.counters == serial[1]